@@ -0,0 +1,339 @@
+"""End-to-end throughput benchmark against local stub servers.
+
+Runs the scripts from a scratch copy with LinkedIn, Groq and Dropbox
+replaced by the stubs in stub_servers.py, so nothing reaches the real
+services:
+
+  cli           python post_to_linkedin.py <Post_ID> for each post in turn,
+                as the batch files do (no posting daemon)
+  scheduler     scheduler.py publishing a batch of posts that are all due
+  process_rows  test2.process_rows generating posts through Groq, plus
+                the Dropbox upload and download of the schedule
+
+For each scenario it reports posts per minute, peak RSS and per-step
+latency: p50/p95/p99 of the publish spans in traces.jsonl for the
+LinkedIn scenarios, and of the Groq and Dropbox calls for process_rows.
+Stub latency, 429s and failures are set on the command line, e.g.
+--latency-ms 80 --rate-429 0.05 shows how retries and the rate limiter
+hold up. The LinkedIn rate limit is off unless --rate-limit-per-minute
+is given, so the numbers show what the code itself can do.
+
+Usage: python benchmarks/e2e_throughput.py [--scenarios cli,scheduler,process_rows]
+           [--posts 50] [--cli-posts 10] [--rows 5] [--variations 3] [--image-ratio 0.5]
+           [--latency-ms 20] [--jitter-ms 5] [--upload-latency-ms 60] [--rate-429 0] [--rate-5xx 0]
+           [--json results.json]
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import tracing
+from stub_servers import StubServers, StubBehaviour
+
+SCHEDULE_DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Run inside the scratch copy; prints one JSON line with its measurements
+PROCESS_ROWS_DRIVER = '''
+import sys
+import json
+import time
+import resource
+import pandas as pd
+import test2
+
+rows, variations, dropbox_runs = (int(arg) for arg in sys.argv[1:4])
+steps = {}
+
+def timed(name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    steps.setdefault(name, []).append(time.perf_counter() - started)
+    return result
+
+df = pd.DataFrame({
+    "Type": ["content"] * rows + ["prompt"] * rows,
+    "Text": [f"Benchmark input {i}: notes from this week's release" for i in range(2 * rows)],
+    "image": [""] * (2 * rows)
+})
+started = time.perf_counter()
+posts = []
+for process_type in ("content", "prompt"):
+    posts += test2.process_rows(df, process_type, variations)[0]
+elapsed = time.perf_counter() - started
+for i in range(rows):
+    timed("groq_enhance", test2.enhance_content, f"Benchmark input {i}")
+    timed("groq_generate", test2.generate_content, f"Benchmark prompt {i}", 1)
+for i in range(dropbox_runs):
+    timed("dropbox_upload", test2.save_scheduled_post, {
+        "Post_ID": f"dropbox-{i}", "Text": "Benchmark post", "Image": None,
+        "Scheduled_DateTime": "2030-01-01 09:00", "Posted": False
+    })
+    timed("dropbox_download", test2.load_scheduled_posts)
+print(json.dumps({"posts": len(posts), "expected": rows * (1 + variations), "elapsed": elapsed, "steps": steps,
+                  "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+def make_workdir(stubs, args, name, **overrides):
+    """Copy the scripts into a scratch directory configured for the stubs, plus any config overrides."""
+    workdir = tempfile.mkdtemp(prefix=f"e2e_{name}_")
+    for path in glob.glob(os.path.join(REPO_DIR, "*.py")):
+        shutil.copy(path, workdir)
+    config = {
+        "LINKEDIN_API_BASE": stubs.base_url,
+        "LINKEDIN_ACCESS_TOKEN": "benchmark-token",
+        "SCHEDULE_FILE": "schedule.json",
+        "LOG_LEVEL": args.log_level,
+        "POSTER_DAEMON_PORT": 0,
+        "METRICS_PORT": 0,
+        "METRICS_SNAPSHOT_INTERVAL": 1,
+        "TRACE_FILE": "traces.jsonl",
+        "POST_WORKERS": args.workers,
+        "MAX_IN_FLIGHT_PER_ACCOUNT": args.workers,
+        "PRESTAGE_MINUTES": 0,
+        "RATE_LIMIT_PER_MINUTE": args.rate_limit_per_minute,
+        "LINKEDIN_RETRY_DELAY": args.retry_delay
+    }
+    config.update(overrides)
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+    return workdir
+
+def make_posts(stubs, prefix, count, image_ratio, scheduled):
+    """Return count schedule entries; the first image_ratio of them have an image."""
+    with_image = round(count * image_ratio)
+    return [{
+        "Post_ID": f"{prefix}-{i}",
+        "Output_Text": f"Benchmark post {i}: what we learned shipping this week. #benchmark",
+        "image": stubs.image_url(f"{prefix}-{i}") if i < with_image else None,
+        "Scheduled_DateTime": scheduled,
+        "Posted": False
+    } for i in range(count)]
+
+def write_schedule(workdir, posts):
+    import pandas as pd
+    with open(os.path.join(workdir, "schedule.json"), "w") as f:
+        json.dump(posts, f)
+    # The Posted flags are merged into output.xlsx, so give them a workbook to land in
+    pd.DataFrame({"Post_ID": [p["Post_ID"] for p in posts], "Output_Text": [p["Output_Text"] for p in posts],
+                  "Posted": False}).to_excel(os.path.join(workdir, "output.xlsx"), index=False)
+
+def wait_measured(process):
+    """Wait for a child; returns (exit status, peak RSS in MB)."""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage.ru_maxrss / 1024
+
+def publish_spans(workdir):
+    """Return (start, end) in seconds of every exported publish trace."""
+    spans = []
+    try:
+        with open(os.path.join(workdir, "traces.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                for resource_spans in request["resourceSpans"]:
+                    for scope_spans in resource_spans["scopeSpans"]:
+                        for item in scope_spans["spans"]:
+                            if item["name"] == "publish":
+                                spans.append((int(item["startTimeUnixNano"]) / 1e9, int(item["endTimeUnixNano"]) / 1e9))
+    except FileNotFoundError:
+        pass
+    return spans
+
+def step_latency(workdir):
+    """Per-step latency from the scenario's traces.jsonl, as tracing.summarize returns it."""
+    trace_file = os.path.join(workdir, "traces.jsonl")
+    return tracing.summarize(trace_file) if os.path.exists(trace_file) else {}
+
+def run_cli(stubs, args):
+    """Publish posts one at a time through the post_to_linkedin.py CLI."""
+    workdir = make_workdir(stubs, args, "cli")
+    try:
+        posts = make_posts(stubs, "cli", args.cli_posts, args.image_ratio, datetime.now(timezone.utc).strftime(SCHEDULE_DATETIME_FORMAT))
+        write_schedule(workdir, posts)
+        succeeded = 0
+        peak_rss = 0
+        started = time.perf_counter()
+        for post in posts:
+            process = subprocess.Popen([sys.executable, "post_to_linkedin.py", post["Post_ID"]], cwd=workdir,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            status, rss = wait_measured(process)
+            succeeded += status == 0
+            peak_rss = max(peak_rss, rss)
+        elapsed = time.perf_counter() - started
+        return {"scenario": "cli", "posts": len(posts), "succeeded": succeeded, "elapsed": elapsed,
+                "posts_per_minute": succeeded / elapsed * 60, "peak_rss_mb": peak_rss,
+                "steps": step_latency(workdir), "stubs": stubs.stats()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_scheduler(stubs, args):
+    """Start scheduler.py on a batch of due posts and time it until all have been attempted."""
+    workdir = make_workdir(stubs, args, "scheduler")
+    process = None
+    try:
+        now = datetime.now(timezone.utc)
+        if now.second >= 50:
+            # Scheduled_DateTime has minute precision; leave the batch most of its trigger window
+            time.sleep(61 - now.second)
+            now = datetime.now(timezone.utc)
+        posts = make_posts(stubs, "scheduler", args.posts, args.image_ratio, now.strftime(SCHEDULE_DATETIME_FORMAT))
+        write_schedule(workdir, posts)
+        started = time.time()
+        overdue = started - now.replace(second=0, microsecond=0).timestamp()
+        process = subprocess.Popen([sys.executable, "scheduler.py"], cwd=workdir,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + args.timeout
+        spans = []
+        while time.monotonic() < deadline and process.poll() is None:
+            spans = publish_spans(workdir)
+            if len(spans) >= len(posts):
+                break
+            time.sleep(0.2)
+        # Give the metrics snapshot a chance to include the last posts
+        snapshot = {}
+        snapshot_file = os.path.join(workdir, "scheduler_metrics.json")
+        for _ in range(15):
+            time.sleep(0.2)
+            try:
+                with open(snapshot_file, "r") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if sum(snapshot["posts"].values()) - snapshot["posts"]["caught_up"] >= len(spans):
+                break
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+        _, peak_rss = wait_measured(process)
+        counters = snapshot.get("posts", {})
+        lag = snapshot.get("publish_lag_seconds", {})
+        busy = (max(end for _, end in spans) - min(start for start, _ in spans)) if spans else 0
+        return {"scenario": "scheduler", "posts": len(posts), "succeeded": counters.get("published", 0),
+                "elapsed": busy, "startup_seconds": (min(start for start, _ in spans) - started) if spans else None,
+                "posts_per_minute": counters.get("published", 0) / busy * 60 if busy else 0,
+                "peak_rss_mb": peak_rss, "missed": counters.get("missed", 0), "failed": counters.get("failed", 0),
+                "mean_lag_seconds": lag["sum"] / lag["count"] if lag.get("count") else None,
+                "overdue_at_start": overdue,
+                "steps": step_latency(workdir), "stubs": stubs.stats()}
+    finally:
+        if process is not None and process.returncode is None:
+            process.kill()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_process_rows(stubs, args):
+    """Generate posts with test2.process_rows against the Groq stub, then time the Dropbox calls."""
+    workdir = make_workdir(stubs, args, "process_rows")
+    try:
+        os.makedirs(os.path.join(workdir, ".streamlit"))
+        with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+            f.write('GROQ_API_KEY = "benchmark"\nLINKEDIN_ACCESS_TOKEN = "benchmark-token"\n'
+                    f'DROPBOX_ACCESS_TOKEN = "benchmark"\nGROQ_REQUEST_DELAY = {args.groq_delay}\n')
+        with open(os.path.join(workdir, "process_rows_driver.py"), "w") as f:
+            f.write(PROCESS_ROWS_DRIVER)
+        env = dict(os.environ, GROQ_BASE_URL=stubs.base_url)
+        dropbox_env = stubs.dropbox_env()
+        if dropbox_env:
+            env.update(dropbox_env)
+        else:
+            print("openssl not found, skipping the Dropbox steps", file=sys.stderr)
+        result = subprocess.run([sys.executable, "process_rows_driver.py", str(args.rows), str(args.variations),
+                                 str(args.rows if dropbox_env else 0)],
+                                cwd=workdir, env=env, capture_output=True, text=True, timeout=args.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"process_rows driver failed with status {result.returncode}:\n{result.stderr[-2000:]}")
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        steps = {}
+        for name, values in measured["steps"].items():
+            values = sorted(value * 1000 for value in values)
+            steps[name] = (len(values), 0, tracing.percentile(values, 0.5), tracing.percentile(values, 0.95),
+                           tracing.percentile(values, 0.99), values[-1])
+        return {"scenario": "process_rows", "posts": measured["expected"], "succeeded": measured["posts"],
+                "elapsed": measured["elapsed"], "posts_per_minute": measured["posts"] / measured["elapsed"] * 60,
+                "peak_rss_mb": measured["maxrss_kb"] / 1024, "steps": steps, "stubs": stubs.stats()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+SCENARIOS = {"cli": run_cli, "scheduler": run_scheduler, "process_rows": run_process_rows}
+
+def print_result(result):
+    print(f"{result['scenario']}: {result['succeeded']}/{result['posts']} posts in {result['elapsed']:.2f}s, "
+          f"{result['posts_per_minute']:.1f} posts/min, peak RSS {result['peak_rss_mb']:.1f} MB")
+    if result["scenario"] == "scheduler":
+        startup = result["startup_seconds"]
+        lag = result["mean_lag_seconds"]
+        print(f"    startup {startup:.2f}s" if startup is not None else "    startup n/a", end="")
+        print(f", mean dispatch lag {lag:.2f}s ({result['overdue_at_start']:.2f}s of it before the start)" if lag is not None else "", end="")
+        print(f", {result['failed']} failed, {result['missed']} missed")
+    if result["steps"]:
+        print(f"    {'step':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, (count, errors, p50, p95, p99, longest) in sorted(result["steps"].items(), key=lambda item: -item[1][3]):
+            print(f"    {name:<20}{count:>8}{errors:>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{longest:>10.1f}")
+    for route, stats in sorted(result["stubs"].items()):
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(stats["statuses"].items()))
+        print(f"    stub {route:<17}{stats['requests']:>6} requests  ({statuses})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--posts", type=int, default=50, help="posts published by the scheduler")
+    parser.add_argument("--cli-posts", type=int, default=10, help="posts published through the CLI")
+    parser.add_argument("--rows", type=int, default=5, help="content rows and prompt rows for process_rows")
+    parser.add_argument("--variations", type=int, default=3)
+    parser.add_argument("--image-ratio", type=float, default=0.5, help="fraction of posts with an image")
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--upload-latency-ms", type=float, default=60, help="latency of image downloads and uploads")
+    parser.add_argument("--groq-latency-ms", type=float, default=300)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of API requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of API requests answered with 503")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--retry-delay", type=float, default=0.2, help="LINKEDIN_RETRY_DELAY for the scripts")
+    parser.add_argument("--rate-limit-per-minute", type=int, default=0, help="RATE_LIMIT_PER_MINUTE, 0 for none")
+    parser.add_argument("--groq-delay", type=float, default=0, help="GROQ_REQUEST_DELAY for process_rows")
+    parser.add_argument("--workers", type=int, default=4, help="POST_WORKERS for the scheduler")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    behaviour = StubBehaviour(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        endpoint_latency_ms={"image": args.upload_latency_ms, "upload": args.upload_latency_ms, "groq": args.groq_latency_ms},
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        image_bytes=args.image_kb * 1024,
+        seed=args.seed
+    )
+    tls_dir = tempfile.mkdtemp(prefix="e2e_tls_")
+    results = []
+    try:
+        with StubServers(behaviour, tls_dir=tls_dir) as stubs:
+            for name in args.scenarios.split(","):
+                result = SCENARIOS[name.strip()](stubs, args)
+                print_result(result)
+                results.append(result)
+    finally:
+        shutil.rmtree(tls_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Scale benchmark for the scheduler's schedule loading and due-post selection.
+
+Generates a large schedule (10k to 1M entries) with a chosen time
+distribution, then runs scheduler.main on it from a scratch copy of the
+scripts for a fixed time, publishing whatever falls due against the
+stubs in stub_servers.py. Posts can be spread over the horizon:
+
+  uniform      evenly from now to now + horizon
+  burst        on --bursts evenly spaced minutes, the first one a minute out
+  normal       around the middle of the horizon, like a daily peak
+  exponential  front-loaded, most of them in the first fifth of the horizon
+
+plus --past-fraction of posts already overdue by up to --past-minutes,
+which exercise the catch-up queue and the missed-window path, and
+--posted-fraction that were published before.
+
+While the scheduler runs, the schedule is touched every
+--reload-interval seconds, as a save from the app would, to force a
+full reload. For each size it reports the first tick (the initial load),
+reload and steady-state tick durations, schedule load and diff times,
+RSS after the first tick and at its peak, dispatch lag and how many
+posts were published, caught up and missed; the lag of caught-up posts
+includes how overdue they already were. Runs of --duration 60 or
+more cross a minute boundary, so posts scheduled for it are dispatched.
+
+Usage: python benchmarks/schedule_scale.py [--counts 10000,100000] [--distribution uniform]
+           [--horizon-minutes 1440] [--backend json|sqlite] [--duration 75] [--reload-interval 5]
+       python benchmarks/schedule_scale.py --counts 1000000 --write-only schedule.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import tracing
+from stub_servers import StubServers, StubBehaviour
+from e2e_throughput import make_workdir, SCHEDULE_DATETIME_FORMAT
+
+DISTRIBUTIONS = ("uniform", "burst", "normal", "exponential")
+
+# Run inside the scratch copy; prints one JSON line with its measurements
+SCHEDULER_DRIVER = '''
+import os
+import sys
+import json
+import time
+import resource
+import threading
+import scheduler
+
+duration, reload_interval, touch_post_id = float(sys.argv[1]), float(sys.argv[2]), sys.argv[3]
+ticks, loads, applies, lags = [], [], [], []
+first_tick_rss = []
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def timed(durations, func):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - started)
+    return wrapper
+
+# Keep every raw sample next to the scheduler's own histograms
+scheduler.load_schedule = timed(loads, scheduler.load_schedule)
+scheduler.apply_schedule_changes = timed(applies, scheduler.apply_schedule_changes)
+observe_tick = scheduler.metrics.observe_tick
+observe_lag = scheduler.metrics.observe_lag
+
+def record_tick(seconds):
+    ticks.append(seconds)
+    if len(ticks) == 1:
+        first_tick_rss.append(current_rss_mb())
+    observe_tick(seconds)
+
+def record_lag(seconds):
+    lags.append(seconds)
+    observe_lag(seconds)
+
+scheduler.metrics.observe_tick = record_tick
+scheduler.metrics.observe_lag = record_lag
+
+def touch_schedule():
+    """Change the schedule the way another process saving it would."""
+    if scheduler.post_to_linkedin.schedule_store:
+        from schedule_store import ScheduleStore
+        ScheduleStore(scheduler.get_schedule_file()).update(touch_post_id, Output_Text=f"Edited at {time.time()}")
+    else:
+        schedule_file = scheduler.get_schedule_file()
+        open(schedule_file, "a").close()
+        os.utime(schedule_file)
+
+started = time.monotonic()
+threading.Thread(target=scheduler.main, daemon=True).start()
+reloads = 0
+while True:
+    remaining = duration - (time.monotonic() - started)
+    if remaining <= 0:
+        break
+    time.sleep(min(reload_interval or remaining, remaining))
+    if reload_interval and time.monotonic() - started < duration:
+        touch_schedule()
+        reloads += 1
+print(json.dumps({
+    "ticks": ticks, "loads": loads, "applies": applies, "lags": lags, "reloads": reloads,
+    "first_tick_rss_mb": first_tick_rss[0] if first_tick_rss else None,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "metrics": scheduler.metrics.snapshot()
+}), flush=True)
+os._exit(0)
+'''
+
+def scheduled_offsets(rng, count, distribution, horizon_minutes, bursts):
+    """Return count offsets from now in minutes, drawn from distribution."""
+    if distribution == "uniform":
+        return [rng.uniform(0, horizon_minutes) for _ in range(count)]
+    if distribution == "burst":
+        step = max(horizon_minutes / max(bursts, 1), 1)
+        return [1 + step * rng.randrange(max(bursts, 1)) for _ in range(count)]
+    if distribution == "normal":
+        return [min(max(rng.gauss(horizon_minutes / 2, horizon_minutes / 6), 0), horizon_minutes) for _ in range(count)]
+    if distribution == "exponential":
+        return [min(rng.expovariate(5 / horizon_minutes), horizon_minutes) for _ in range(count)]
+    raise ValueError(f"Unknown distribution {distribution!r}, expected one of {', '.join(DISTRIBUTIONS)}")
+
+def generate_schedule(count, distribution="uniform", horizon_minutes=1440, bursts=4, past_fraction=0.01,
+                      past_minutes=60, posted_fraction=0.1, image_ratio=0.0, image_url=None, seed=0, now=None):
+    """Return count schedule entries in the format test2.py writes them."""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    past = round(count * past_fraction)
+    offsets = [-rng.uniform(0, past_minutes) for _ in range(past)]
+    offsets += scheduled_offsets(rng, count - past, distribution, horizon_minutes, bursts)
+    posts = []
+    for i, offset in enumerate(offsets):
+        post_id = f"scale-{i:07d}"
+        posts.append({
+            "Post_ID": post_id,
+            "Output_Text": f"Scale benchmark post {i}: sharing a few lessons from this week. #benchmark",
+            "image": image_url(post_id) if image_url and rng.random() < image_ratio else None,
+            "Scheduled_DateTime": (now + timedelta(minutes=offset)).strftime(SCHEDULE_DATETIME_FORMAT),
+            "Posted": rng.random() < posted_fraction
+        })
+    return posts
+
+def write_schedule(path, posts, backend):
+    """Write posts as schedule.json or into a ScheduleStore database."""
+    if backend == "sqlite":
+        from schedule_store import ScheduleStore
+        ScheduleStore(path).replace_all(posts)
+    else:
+        with open(path, "w") as f:
+            json.dump(posts, f)
+
+def summarize_ms(values):
+    """Return (count, p50, p95, p99, max) in milliseconds, or None without samples."""
+    if not values:
+        return None
+    values = sorted(value * 1000 for value in values)
+    return (len(values), tracing.percentile(values, 0.5), tracing.percentile(values, 0.95),
+            tracing.percentile(values, 0.99), values[-1])
+
+def run_size(stubs, args, count):
+    """Generate a schedule of count posts and run the scheduler on it."""
+    schedule_name = "schedule.db" if args.backend == "sqlite" else "schedule.json"
+    workdir = make_workdir(stubs, args, f"scale_{count}", SCHEDULE_BACKEND=args.backend, SCHEDULE_DB=schedule_name,
+                           METRICS_SNAPSHOT_FILE="", PRESTAGE_MINUTES=args.prestage_minutes)
+    try:
+        started = time.perf_counter()
+        posts = generate_schedule(count, args.distribution, args.horizon_minutes, args.bursts, args.past_fraction,
+                                  args.past_minutes, args.posted_fraction, args.image_ratio, stubs.image_url, args.seed)
+        schedule_file = os.path.join(workdir, schedule_name)
+        write_schedule(schedule_file, posts, args.backend)
+        generate_seconds = time.perf_counter() - started
+        # The post that is edited to force a reload; the last one is furthest out
+        touch_post_id = posts[-1]["Post_ID"]
+        del posts
+        with open(os.path.join(workdir, "scheduler_driver.py"), "w") as f:
+            f.write(SCHEDULER_DRIVER)
+        result = subprocess.run([sys.executable, "scheduler_driver.py", str(args.duration), str(args.reload_interval),
+                                 touch_post_id], cwd=workdir, capture_output=True, text=True,
+                                timeout=args.duration + args.timeout)
+        if result.returncode != 0 or not result.stdout.strip():
+            raise RuntimeError(f"Scheduler driver failed with status {result.returncode}:\n{result.stderr[-2000:]}")
+        measured = json.loads(result.stdout.strip().splitlines()[-1])
+        counters = measured["metrics"]["posts"]
+        return {
+            "count": count,
+            # A fresh SQLite store may still hold most of its rows in the -wal file
+            "file_mb": sum(os.path.getsize(path) for path in (schedule_file, schedule_file + "-wal") if os.path.exists(path)) / 2 ** 20,
+            "generate_seconds": generate_seconds,
+            "first_tick_ms": measured["ticks"][0] * 1000 if measured["ticks"] else None,
+            "ticks": summarize_ms(measured["ticks"][1:]),
+            "loads": summarize_ms(measured["loads"]),
+            "applies": summarize_ms(measured["applies"]),
+            "lags": summarize_ms(measured["lags"]),
+            "reloads": measured["reloads"],
+            "first_tick_rss_mb": measured["first_tick_rss_mb"],
+            "peak_rss_mb": measured["peak_rss_mb"],
+            "published": counters["published"],
+            "failed": counters["failed"],
+            "caught_up": counters["caught_up"],
+            "missed": counters["missed"],
+            "queue_depth": measured["metrics"]["queue_depth"]
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_result(result):
+    print(f"{result['count']} posts: {result['file_mb']:.1f} MB schedule, generated in {result['generate_seconds']:.1f}s")
+    first_tick = result["first_tick_ms"]
+    print(f"    first tick (initial load) {first_tick:.1f} ms" if first_tick is not None else "    no tick completed",
+          f", RSS after it {result['first_tick_rss_mb']:.1f} MB" if result["first_tick_rss_mb"] else "",
+          f", peak RSS {result['peak_rss_mb']:.1f} MB, {result['reloads']} forced reloads", sep="")
+    print(f"    {'':<20}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for label, stats, unit in (("tick ms", result["ticks"], 1), ("load_schedule ms", result["loads"], 1),
+                               ("apply changes ms", result["applies"], 1), ("dispatch lag s", result["lags"], 1000)):
+        if stats:
+            count, p50, p95, p99, longest = stats
+            print(f"    {label:<20}{count:>8}{p50 / unit:>10.2f}{p95 / unit:>10.2f}{p99 / unit:>10.2f}{longest / unit:>10.2f}")
+    depth = result["queue_depth"]
+    print(f"    published {result['published']}, failed {result['failed']}, caught up {result['caught_up']}, "
+          f"missed {result['missed']}, still queued {depth['all']} ({depth['overdue']} overdue)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--counts", default="10000,100000", help="comma-separated schedule sizes")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--horizon-minutes", type=float, default=1440)
+    parser.add_argument("--bursts", type=int, default=4, help="burst minutes for --distribution burst")
+    parser.add_argument("--past-fraction", type=float, default=0.01, help="fraction of posts already overdue")
+    parser.add_argument("--past-minutes", type=float, default=60, help="how far overdue they are at most")
+    parser.add_argument("--posted-fraction", type=float, default=0.1)
+    parser.add_argument("--image-ratio", type=float, default=0.0)
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--duration", type=float, default=75, help="seconds to run the scheduler for each size")
+    parser.add_argument("--reload-interval", type=float, default=5, help="seconds between forced reloads, 0 for none")
+    parser.add_argument("--prestage-minutes", type=float, default=0, help="PRESTAGE_MINUTES for the scheduler")
+    parser.add_argument("--workers", type=int, default=4, help="POST_WORKERS for the scheduler")
+    parser.add_argument("--latency-ms", type=float, default=20, help="latency of the LinkedIn stubs")
+    parser.add_argument("--rate-limit-per-minute", type=int, default=0, help="RATE_LIMIT_PER_MINUTE, 0 for none")
+    parser.add_argument("--retry-delay", type=float, default=0.2, help="LINKEDIN_RETRY_DELAY for the scheduler")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--timeout", type=float, default=600, help="extra seconds allowed for loading and shutdown")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-only", metavar="PATH", help="only write a schedule of the first size to PATH")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    counts = [int(count) for count in args.counts.split(",")]
+
+    if args.write_only:
+        posts = generate_schedule(counts[0], args.distribution, args.horizon_minutes, args.bursts, args.past_fraction,
+                                  args.past_minutes, args.posted_fraction, seed=args.seed)
+        write_schedule(args.write_only, posts, args.backend)
+        print(f"Wrote {len(posts)} posts to {args.write_only}")
+        return
+
+    results = []
+    with StubServers(StubBehaviour(latency_ms=args.latency_ms, seed=args.seed)) as stubs:
+        for count in counts:
+            result = run_size(stubs, args, count)
+            print_result(result)
+            results.append(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
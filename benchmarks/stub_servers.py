@@ -0,0 +1,306 @@
+"""Local stand-ins for the LinkedIn, Groq and Dropbox APIs, for benchmarks.
+
+StubServers answers on 127.0.0.1 with just enough of each API for the
+scripts to run end to end:
+
+  LinkedIn  GET /rest/me, POST /v2/assets?action=registerUpload, the
+            upload URL it hands out (/upload/<n>) and POST /v2/ugcPosts;
+            images to post are served from /images/<name>
+  Groq      POST /openai/v1/chat/completions (set GROQ_BASE_URL)
+  Dropbox   POST /2/files/upload and /2/files/download over TLS, since
+            the Dropbox SDK only speaks https (see dropbox_env())
+
+Latency, 429 responses and failures are injected per StubBehaviour.
+Every answered request is counted per route in StubServers.stats().
+"""
+import os
+import ssl
+import json
+import time
+import random
+import shutil
+import hashlib
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENERATED_TEXT = (
+    "Excited to share what our team has been building this quarter. We focused on the details that make "
+    "everyday work smoother: faster reviews, clearer ownership and fewer handoffs. The result is more time "
+    "for the problems that matter to our customers. Curious how small process changes can add up? "
+    "Let's connect and compare notes on what has worked for your team. #Productivity #Leadership"
+)
+
+class StubBehaviour:
+    """Latency and failures injected into stub responses.
+
+    Each response waits latency_ms, give or take up to jitter_ms;
+    endpoint_latency_ms overrides it for single routes (me,
+    registerUpload, upload, ugcPosts, image, groq, dropbox_upload,
+    dropbox_download). A fraction rate_429 of API requests is answered
+    with 429 and Retry-After: retry_after, and a fraction rate_5xx with
+    503. Image downloads are delayed but never failed.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, endpoint_latency_ms=None, rate_429=0.0, rate_5xx=0.0,
+                 retry_after=1, image_bytes=100 * 1024, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.endpoint_latency_ms = dict(endpoint_latency_ms or {})
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.image_bytes = image_bytes
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, route):
+        """Seconds to wait before answering a request to route."""
+        latency = self.endpoint_latency_ms.get(route, self.latency_ms)
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(latency + jitter, 0) / 1000
+
+    def fault(self, route):
+        """Return 429, 503 or None for a request to route."""
+        if route == "image":
+            return None
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_5xx:
+            return 503
+        return None
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def route(self):
+        path = self.path.split("?")[0]
+        if path == "/rest/me":
+            return "me"
+        if path == "/v2/assets" and "action=registerUpload" in self.path:
+            return "registerUpload"
+        if path.startswith("/upload/"):
+            return "upload"
+        if path == "/v2/ugcPosts":
+            return "ugcPosts"
+        if path.startswith("/images/"):
+            return "image"
+        if path == "/openai/v1/chat/completions":
+            return "groq"
+        if path == "/2/files/upload":
+            return "dropbox_upload"
+        if path == "/2/files/download":
+            return "dropbox_download"
+        return None
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def handle_request(self):
+        started = time.perf_counter()
+        stubs = self.server.stubs
+        route = self.route()
+        body = self.read_body() if self.command == "POST" else b""
+        if route is None:
+            self.send(404, {"message": f"No stub for {self.command} {self.path}"})
+            stubs.record("unknown", 404, time.perf_counter() - started)
+            return
+        time.sleep(stubs.behaviour.delay(route))
+        status = stubs.behaviour.fault(route)
+        if status == 429:
+            self.send(429, {"message": "Too many requests", "error_summary": "too_many_requests/",
+                            "error": {"reason": {".tag": "too_many_requests"}, "retry_after": stubs.behaviour.retry_after}},
+                      headers={"Retry-After": str(stubs.behaviour.retry_after)})
+        elif status == 503:
+            self.send(503, {"message": "Service unavailable"})
+        else:
+            status = getattr(self, f"answer_{route}")(body)
+        stubs.record(route, status, time.perf_counter() - started)
+
+    do_GET = do_HEAD = do_POST = handle_request
+
+    def answer_me(self, body):
+        self.send(200, {"id": "benchmark-user", "localizedFirstName": "Benchmark"})
+        return 200
+
+    def answer_registerUpload(self, body):
+        n = self.server.stubs.next_id()
+        asset = f"urn:li:digitalmediaAsset:benchmark{n}"
+        self.send(200, {"value": {
+            "uploadMechanism": {"com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest": {
+                "uploadUrl": f"{self.server.stubs.base_url}/upload/{n}", "headers": {}
+            }},
+            "asset": asset,
+            "mediaArtifact": f"urn:li:digitalmediaMediaArtifact:({asset},urn:li:digitalmediaMediaArtifactClass:feedshare-uploadedImage)"
+        }})
+        return 200
+
+    def answer_upload(self, body):
+        self.send(201, b"", "text/plain")
+        return 201
+
+    def answer_ugcPosts(self, body):
+        share = f"urn:li:share:{self.server.stubs.next_id()}"
+        self.send(201, {"id": share}, headers={"X-RestLi-Id": share})
+        return 201
+
+    def answer_image(self, body):
+        name = self.path.split("?")[0].rsplit("/", 1)[-1]
+        self.send(200, self.server.stubs.image, "image/jpeg", headers={"ETag": f'"{name}"'})
+        return 200
+
+    def answer_groq(self, body):
+        request = json.loads(body or b"{}")
+        self.send(200, {
+            "id": f"chatcmpl-benchmark{self.server.stubs.next_id()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "benchmark"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": GENERATED_TEXT},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": {"prompt_tokens": 60, "completion_tokens": 80, "total_tokens": 140}
+        })
+        return 200
+
+    def answer_dropbox_upload(self, body):
+        path = json.loads(self.headers.get("Dropbox-API-Arg", "{}")).get("path", "/")
+        self.server.stubs.files[path] = body
+        self.send(200, dropbox_metadata(path, body))
+        return 200
+
+    def answer_dropbox_download(self, body):
+        path = json.loads(self.headers.get("Dropbox-API-Arg", "{}")).get("path", "/")
+        content = self.server.stubs.files.get(path)
+        if content is None:
+            self.send(409, {"error_summary": "path/not_found/",
+                            "error": {".tag": "path", "path": {".tag": "not_found"}}})
+            return 409
+        self.send(200, content, "application/octet-stream",
+                  headers={"Dropbox-API-Result": json.dumps(dropbox_metadata(path, content))})
+        return 200
+
+    def log_message(self, format, *args):
+        pass
+
+def dropbox_metadata(path, content):
+    """FileMetadata as the Dropbox API returns it for path."""
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "id": "id:benchmark",
+        "client_modified": "2025-01-01T00:00:00Z",
+        "server_modified": "2025-01-01T00:00:00Z",
+        "rev": "0123456789abcdef",
+        "size": len(content),
+        "path_lower": path.lower(),
+        "path_display": path,
+        "content_hash": hashlib.sha256(content).hexdigest()
+    }
+
+class StubServers:
+    """Runs the stub APIs in background threads; use as a context manager.
+
+    base_url is the LinkedIn API base (LINKEDIN_API_BASE) and the Groq
+    base URL (GROQ_BASE_URL). Images are at image_url(name).
+    """
+
+    def __init__(self, behaviour=None, tls_dir=None):
+        self.behaviour = behaviour or StubBehaviour()
+        self.image = os.urandom(self.behaviour.image_bytes)
+        self.files = {}
+        self.tls_dir = tls_dir
+        self._counter = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._servers = []
+        self.server = self._start(None)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.tls_server = None
+        self.ca_file = None
+        if tls_dir and shutil.which("openssl"):
+            self.ca_file = make_certificate(tls_dir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.ca_file, os.path.join(tls_dir, "key.pem"))
+            self.tls_server = self._start(context)
+
+    def _start(self, context):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.daemon_threads = True
+        server.stubs = self
+        if context is not None:
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+        self._servers.append(server)
+        return server
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def next_id(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def record(self, route, status, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(route, {"requests": 0, "statuses": {}, "seconds": 0.0})
+            stats["requests"] += 1
+            stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+            stats["seconds"] += seconds
+
+    def stats(self):
+        """Return {route: {"requests", "statuses": {status: count}, "seconds"}} and reset the counters."""
+        with self._lock:
+            stats, self._stats = self._stats, {}
+        return stats
+
+    def image_url(self, name):
+        return f"{self.base_url}/images/{name}.jpg"
+
+    def dropbox_env(self):
+        """Environment pointing the Dropbox SDK at the TLS stub, or None without openssl."""
+        if self.tls_server is None:
+            return None
+        host = f"localhost:{self.tls_server.server_port}"
+        return {"DROPBOX_API_HOST": host, "DROPBOX_API_CONTENT_HOST": host, "REQUESTS_CA_BUNDLE": self.ca_file}
+
+def make_certificate(directory):
+    """Create a self-signed certificate for localhost with openssl; returns the certificate path."""
+    cert_file = os.path.join(directory, "cert.pem")
+    subprocess.run([
+        "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+        "-keyout", os.path.join(directory, "key.pem"), "-out", cert_file,
+        "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"
+    ], check=True, capture_output=True)
+    return cert_file
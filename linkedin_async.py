@@ -0,0 +1,289 @@
+import sys
+import json
+import asyncio
+import aiohttp
+import tracing
+import post_to_linkedin
+from post_to_linkedin import (
+    config, logger, user_id_cache, asset_cache, retry_policy, rate_limiter, rate_limits, linkedin_headers,
+    build_register_payload, build_post_payload, UPLOAD_CHUNK_SIZE, LINKEDIN_API_BASE, ImageSourceError
+)
+from linkedin_retry import retry_after_seconds, RETRY_STATUSES, NON_IDEMPOTENT_RETRY_STATUSES
+
+class AsyncLinkedInClient:
+    """Coroutine versions of the LinkedIn calls in post_to_linkedin.py.
+
+    All calls share one aiohttp connection pool, so a single event loop can
+    keep many publishes in flight and overlap their image uploads. Retries
+    and the circuit breaker follow post_to_linkedin.retry_policy. Use it
+    as an async context manager.
+    """
+
+    def __init__(self, connection_limit=None, timeout=10):
+        self.connection_limit = connection_limit or config.get("ASYNC_CONNECTION_LIMIT", 50)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connection_limit),
+            timeout=self.timeout
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def send(self, send, budget=None, description="LinkedIn request", limits=None, idempotent=True):
+        """Await send() under the rate limiter and retry_policy until it returns a final (status, body).
+
+        send is a coroutine function returning (status, headers, body).
+        limits are the rate limit buckets from post_to_linkedin.rate_limits.
+        A request that is not idempotent is retried only after a 429 or a
+        failure to connect, as in RetryPolicy.send.
+        """
+        budget = budget or retry_policy.budget()
+        statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+        attempt = 0
+        while True:
+            # The breaker and the rate limiter block, so wait for them off the event loop
+            await asyncio.to_thread(retry_policy.acquire)
+            try:
+                # Inside the try, so a cancelled or failed wait frees a half-open probe slot
+                if limits:
+                    await asyncio.to_thread(rate_limiter.acquire, limits)
+                status, headers, body = await send()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                retry_policy.record()
+                sendable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                delay = retry_policy.next_delay(None, None, attempt, budget) if sendable else None
+                if delay is None:
+                    raise
+                logger.warning(f"{description} failed: {e!r}, retrying in {delay:.1f}s ({budget.remaining} retries left)")
+            except BaseException:
+                # Not a LinkedIn outcome, including cancellation; free the half-open probe slot
+                retry_policy.release()
+                raise
+            else:
+                retry_policy.record(status)
+                if status == 429 and limits:
+                    await asyncio.to_thread(rate_limiter.penalize, limits, retry_after_seconds(headers))
+                delay = retry_policy.next_delay(status, headers, attempt, budget, statuses)
+                if delay is None:
+                    return status, body
+                logger.warning(f"{description} returned {status}, retrying in {delay:.1f}s ({budget.remaining} retries left)")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def request(self, method, url, budget=None, idempotent=True, **kwargs):
+        """Send one LinkedIn API request; returns (status, body bytes)."""
+        async def send():
+            async with self.session.request(method, url, **kwargs) as response:
+                return response.status, response.headers, await response.read()
+        access_token = kwargs.get("headers", {}).get("Authorization", "").removeprefix("Bearer ")
+        return await self.send(send, budget, f"{method} {url.split('?')[0]}", rate_limits(access_token, url), idempotent)
+
+    @tracing.traced("get_user_id")
+    async def get_linkedin_user_id(self, access_token, budget=None):
+        """Return the LinkedIn user ID for a token, from the cache or the /rest/me API."""
+        if not access_token:
+            logger.error("LinkedIn access token is empty.")
+            return None
+        user_id = user_id_cache.get(access_token)
+        if user_id:
+            return user_id
+        url = f"{LINKEDIN_API_BASE}/rest/me"
+        try:
+            status, body = await self.request("GET", url, budget, headers=linkedin_headers(access_token))
+            if status >= 400:
+                logger.error(f"HTTP error fetching LinkedIn user ID, Status: {status}, Response: {body.decode(errors='replace')}")
+                return None
+            user_id = json.loads(body).get("id")
+        except Exception as e:
+            logger.error(f"Error fetching LinkedIn user ID: {e}")
+            return None
+        if not user_id:
+            logger.error("No 'id' found in LinkedIn /rest/me response.")
+            return None
+        logger.info(f"Fetched LinkedIn user ID: {user_id}")
+        user_id_cache.set(access_token, user_id)
+        return user_id
+
+    @tracing.traced("register_upload", ok=lambda result: result[0] is not None)
+    async def register_image_upload(self, access_token, user_id, budget=None):
+        """Register an image upload; returns (upload_url, asset_urn, media_artifact)."""
+        url = f"{LINKEDIN_API_BASE}/v2/assets?action=registerUpload"
+        try:
+            status, body = await self.request("POST", url, budget, headers=linkedin_headers(access_token), json=build_register_payload(user_id))
+            if status >= 400:
+                logger.error(f"HTTP error registering image upload, Status: {status}, Response: {body.decode(errors='replace')}")
+                if status == 401:
+                    user_id_cache.invalidate(access_token)
+                return None, None, None
+            data = json.loads(body)
+            upload_url = data["value"]["uploadMechanism"]["com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest"]["uploadUrl"]
+            asset_urn = data["value"]["asset"]
+            logger.info(f"Registered image upload, uploadUrl: {upload_url[:50]}..., asset: {asset_urn}")
+            return upload_url, asset_urn, data["value"]["mediaArtifact"]
+        except Exception as e:
+            logger.error(f"Error registering image upload: {e}")
+            return None, None, None
+
+    @tracing.traced("image_upload")
+    async def upload_image(self, image_url, upload_url, access_token, budget=None):
+        """Stream an image from image_url to the LinkedIn upload URL in fixed-size chunks.
+
+        Image host failures raise ImageSourceError, which the circuit
+        breaker does not count.
+        """
+        async def open_source():
+            try:
+                source = await self.session.get(image_url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise ImageSourceError(f"Error fetching image {image_url}: {e!r}") from e
+            if source.status >= 400:
+                source.release()
+                raise ImageSourceError(f"HTTP error fetching image {image_url}, Status: {source.status}")
+            return source
+
+        sources = []
+
+        async def send():
+            # The first download is checked before any LinkedIn request; retries fetch the image again
+            async with (sources.pop() if sources else await open_source()) as source:
+                headers = {"Authorization": f"Bearer {access_token}"}
+                if source.content_length is not None:
+                    headers["Content-Length"] = str(source.content_length)
+                async with self.session.post(upload_url, headers=headers, data=source.content.iter_chunked(UPLOAD_CHUNK_SIZE)) as response:
+                    return response.status, response.headers, await response.read()
+
+        try:
+            sources.append(await open_source())
+            status, body = await self.send(send, budget, "Image upload", rate_limits(access_token, upload_url))
+            if status >= 400:
+                logger.error(f"HTTP error uploading image, Status: {status}, Response: {body.decode(errors='replace')}")
+                return False
+            logger.info(f"Successfully uploaded image from {image_url}")
+            return True
+        except ImageSourceError as e:
+            logger.error(str(e))
+            return False
+        except Exception as e:
+            logger.error(f"Error uploading image: {e}")
+            return False
+        finally:
+            for source in sources:
+                source.release()
+
+    @tracing.traced("ugc_post")
+    async def create_post(self, access_token, user_id, text, asset_urn=None, budget=None):
+        """Publish a ugcPost; returns True on success."""
+        url = f"{LINKEDIN_API_BASE}/v2/ugcPosts"
+        try:
+            status, body = await self.request("POST", url, budget, idempotent=False, headers=linkedin_headers(access_token),
+                                             json=build_post_payload(user_id, text, asset_urn))
+            if status >= 400:
+                logger.error(f"HTTP error posting to LinkedIn, Status: {status}, Response: {body.decode(errors='replace')}")
+                if status == 401:
+                    user_id_cache.invalidate(access_token)
+                return False
+            logger.info(f"Successfully posted to LinkedIn: {text[:50]}...")
+            return True
+        except Exception as e:
+            logger.error(f"Error posting to LinkedIn: {e}")
+            return False
+
+    @tracing.traced("image_fingerprint", ok=lambda result: True)
+    async def image_fingerprint(self, image_url):
+        """Return the URL with its ETag, or Last-Modified and length, or None if the source has neither."""
+        try:
+            async with self.session.head(image_url, allow_redirects=True) as response:
+                if response.status >= 400:
+                    return None
+                etag = response.headers.get("ETag")
+                if etag:
+                    return f"{image_url}|etag:{etag}"
+                last_modified = response.headers.get("Last-Modified")
+                if last_modified and response.content_length:
+                    return f"{image_url}|lm:{last_modified}|len:{response.content_length}"
+        except Exception as e:
+            logger.debug(f"HEAD {image_url} failed: {e}")
+        return None
+
+    @tracing.traced("image_asset")
+    async def get_image_asset(self, access_token, user_id, image_url, budget=None):
+        """Return an asset URN for an image, uploading it only if no cached asset matches."""
+        fingerprint = await self.image_fingerprint(image_url)
+        if fingerprint:
+            asset_urn = asset_cache.get(user_id, fingerprint)
+            if asset_urn:
+                logger.info(f"Reusing uploaded asset {asset_urn} for {image_url}")
+                return asset_urn
+        upload_url, asset_urn, _ = await self.register_image_upload(access_token, user_id, budget)
+        if not upload_url or not await self.upload_image(image_url, upload_url, access_token, budget):
+            return None
+        if fingerprint:
+            asset_cache.set(user_id, fingerprint, asset_urn)
+        return asset_urn
+
+    async def publish(self, post):
+        """Register, upload and publish one schedule entry; returns True on success."""
+        with tracing.span("publish", post_id=post["Post_ID"]) as current:
+            success = await self._publish(post)
+            if not success:
+                current.set_error()
+            return success
+
+    async def _publish(self, post):
+        access_token = post_to_linkedin.get_access_token(post)
+        budget = retry_policy.budget()
+        user_id = await self.get_linkedin_user_id(access_token, budget)
+        if not user_id:
+            logger.error(f"Failed to fetch user ID for Post_ID {post['Post_ID']}")
+            return False
+        asset_urn = post_to_linkedin.staged_asset(post)
+        if asset_urn:
+            logger.info(f"Using pre-staged asset {asset_urn} for Post_ID {post['Post_ID']}")
+        elif post.get("image"):
+            asset_urn = await self.get_image_asset(access_token, user_id, post["image"], budget)
+            if not asset_urn:
+                logger.error(f"Failed to register or upload image for Post_ID {post['Post_ID']}")
+                return False
+        return await self.create_post(access_token, user_id, post["Output_Text"], asset_urn, budget)
+
+async def publish_posts(post_ids, concurrency=None):
+    """Publish several scheduled posts concurrently; returns {Post_ID: success}."""
+    concurrency = concurrency or config.get("POST_WORKERS", 4)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with AsyncLinkedInClient() as client:
+        async def publish_one(post_id):
+            post = post_to_linkedin.get_scheduled_post(post_id)
+            if not post:
+                logger.error(f"Post_ID {post_id} not found in the schedule")
+                return False
+            if post.get("Posted"):
+                logger.warning(f"Post_ID {post_id} is already posted, not publishing it again")
+                return True
+            async with semaphore:
+                success = await client.publish(post)
+            if success:
+                # The journal append blocks on fsync and the workbook update on
+                # a file lock, so keep both off the event loop
+                await asyncio.to_thread(post_to_linkedin.mark_posted, post_id)
+                await asyncio.to_thread(post_to_linkedin.update_output_workbook, post_id)
+            return success
+        results = await asyncio.gather(*(publish_one(post_id) for post_id in post_ids))
+    return dict(zip(post_ids, results))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        logger.error("Usage: python linkedin_async.py <Post_ID> [<Post_ID> ...]")
+        sys.exit(1)
+    results = asyncio.run(publish_posts(sys.argv[1:]))
+    if any(results.values()) and config.get("OUTPUT_FLUSH_ON_EXIT", True):
+        # As in post_to_linkedin.py, no long-running process may be around to merge the updates
+        try:
+            post_to_linkedin.workbook_sink.flush(wait=True)
+        except Exception as e:
+            logger.error(f"Error merging status updates into output.xlsx: {e}")
+    sys.exit(0 if all(results.values()) else 1)
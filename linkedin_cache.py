@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger()
+
+def token_key(access_token):
+    """Hash an access token so it is never written to disk."""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+class JsonFileCache:
+    """Small key/value cache kept in memory and mirrored to a JSON file.
+
+    Entries expire after ttl seconds. The file is re-read on a miss, so
+    values cached by other processes are picked up.
+    """
+
+    def __init__(self, cache_file, ttl):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache file {self.cache_file}: {e}")
+            return {}
+
+    def _write(self):
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Error writing cache file {self.cache_file}: {e}")
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] > time.time():
+            return entry["value"]
+        return None
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self._entries.update(self._read())
+                value = self._lookup(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.update(self._read())
+            now = time.time()
+            self._entries = {k: v for k, v in self._entries.items() if v["expires_at"] > now}
+            self._entries[key] = {"value": value, "expires_at": now + self.ttl}
+            self._write()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.update(self._read())
+            if self._entries.pop(key, None) is not None:
+                self._write()
+
+class UserIdCache(JsonFileCache):
+    """LinkedIn user IDs keyed by a hash of the access token."""
+
+    def get(self, access_token):
+        return super().get(token_key(access_token))
+
+    def set(self, access_token, user_id):
+        super().set(token_key(access_token), user_id)
+
+    def invalidate(self, access_token):
+        super().invalidate(token_key(access_token))
+
+class AssetCache(JsonFileCache):
+    """Uploaded image asset URNs keyed by owner and image fingerprint.
+
+    The fingerprint is the image URL plus its ETag or Last-Modified and
+    length, or a hash of the image bytes, so a changed image is uploaded
+    again.
+    """
+
+    @staticmethod
+    def _key(user_id, fingerprint):
+        return hashlib.sha256(f"{user_id}|{fingerprint}".encode("utf-8")).hexdigest()
+
+    def get(self, user_id, fingerprint):
+        return super().get(self._key(user_id, fingerprint))
+
+    def set(self, user_id, fingerprint, asset_urn):
+        super().set(self._key(user_id, fingerprint), asset_urn)
+
+    def invalidate(self, user_id, fingerprint):
+        super().invalidate(self._key(user_id, fingerprint))
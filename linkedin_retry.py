@@ -0,0 +1,214 @@
+import time
+import random
+import logging
+import threading
+import requests
+import urllib3
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+import pytz
+
+logger = logging.getLogger()
+
+# Throttling and server-side failures are worth another try; anything else is final
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# A request that is not idempotent may have taken effect unless it was throttled
+NON_IDEMPOTENT_RETRY_STATUSES = (429,)
+
+class CircuitOpenError(Exception):
+    """Raised when the LinkedIn API has been failing and requests are paused."""
+
+class RetryBudget:
+    """Retries left for one publish, shared by every request it makes.
+
+    A publish that needs the user ID, an image upload and the ugcPost can
+    therefore never retry more than the budget in total.
+    """
+
+    def __init__(self, retries):
+        self.remaining = retries
+
+    def take(self):
+        """Use up one retry; returns False if none are left."""
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+class CircuitBreaker:
+    """Pause all requests after repeated server or connection failures.
+
+    After failure_threshold failures in a row the circuit opens and
+    acquire() blocks. Once reset_timeout has passed, one caller is let
+    through as a probe: its success closes the circuit, its failure opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Wait until a request may be sent; returns False if the circuit stays open past timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self.opened_at is None:
+                    return True
+                now = time.monotonic()
+                open_for = self.opened_at + self.reset_timeout - now
+                if open_for <= 0 and not self.probing:
+                    self.probing = True
+                    logger.info("LinkedIn circuit half-open, sending a probe request")
+                    return True
+                wait = open_for if open_for > 0 else self.reset_timeout
+                if deadline is not None:
+                    if deadline <= now:
+                        return False
+                    wait = min(wait, deadline - now)
+                self._cond.wait(wait)
+
+    def record_success(self):
+        with self._cond:
+            if self.opened_at is not None:
+                logger.info("LinkedIn circuit closed, resuming requests")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self._cond.notify_all()
+
+    def release_probe(self):
+        """Let another caller probe when the probe ended without a LinkedIn outcome."""
+        with self._cond:
+            if self.probing:
+                self.probing = False
+                self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.error(f"LinkedIn circuit opened after {self.failures} failures, pausing requests for {self.reset_timeout}s")
+                self.opened_at = time.monotonic()
+                self.probing = False
+            self._cond.notify_all()
+
+def retry_after_seconds(headers):
+    """Parse a Retry-After header given in seconds or as an HTTP date; returns None if absent."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(pytz.UTC)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+def never_sent(error):
+    """True if a requests exception shows the request never reached the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError) or not error.args:
+        return False
+    # Connection refused and DNS failures; urllib3's NewConnectionError is a ConnectTimeoutError
+    return isinstance(getattr(error.args[0], "reason", None), urllib3.exceptions.ConnectTimeoutError)
+
+class RetryPolicy:
+    """The one retry policy used for every LinkedIn API call.
+
+    Retries 429 and 5xx responses and connection errors with full-jitter
+    exponential backoff, or after Retry-After when the server sends one.
+    Auth errors and other 4xx responses are returned at once. Every retry
+    is taken from a RetryBudget, and all calls go through the circuit
+    breaker. Requests that are not idempotent, such as creating a post,
+    are only retried after a 429 or when the connection was never made:
+    after a timeout or a 5xx LinkedIn may already have acted on them.
+    """
+
+    def __init__(self, retries=4, base_delay=2, max_delay=60, breaker=None, breaker_wait=120):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.breaker_wait = breaker_wait
+
+    def budget(self):
+        return RetryBudget(self.retries)
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number attempt (counting from 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def acquire(self):
+        """Wait for the circuit breaker; raises CircuitOpenError if it stays open."""
+        if self.breaker and not self.breaker.acquire(self.breaker_wait):
+            raise CircuitOpenError(f"LinkedIn API circuit still open after waiting {self.breaker_wait}s")
+
+    def record(self, status=None):
+        """Feed one outcome to the breaker; status is None for a connection error."""
+        if not self.breaker:
+            return
+        if status is None or status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def release(self):
+        """Call after an acquire() whose request ended without a response or connection error."""
+        if self.breaker:
+            self.breaker.release_probe()
+
+    def next_delay(self, status, headers, attempt, budget, statuses=RETRY_STATUSES):
+        """Return how long to wait before retrying, or None if the request should not be retried."""
+        if status is not None and status not in statuses:
+            return None
+        delay = retry_after_seconds(headers)
+        if delay is None:
+            delay = self.backoff(attempt)
+        elif delay > self.max_delay:
+            logger.warning(f"Retry-After of {delay:.0f}s exceeds the {self.max_delay}s limit, not retrying")
+            return None
+        if not budget.take():
+            logger.warning("Retry budget exhausted")
+            return None
+        return delay
+
+    def send(self, send, budget=None, description="LinkedIn request", idempotent=True):
+        """Call send() until it returns a final response; returns the last response.
+
+        Connection errors are re-raised once no retry is left, or at once
+        for a request that is not idempotent and may have been sent.
+        """
+        budget = budget or self.budget()
+        statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.record()
+                delay = self.next_delay(None, None, attempt, budget) if idempotent or never_sent(e) else None
+                if delay is None:
+                    raise
+                logger.warning(f"{description} failed: {e}, retrying in {delay:.1f}s ({budget.remaining} retries left)")
+            except BaseException:
+                # Not a LinkedIn outcome, but a half-open circuit must not stay waiting on this probe
+                self.release()
+                raise
+            else:
+                self.record(response.status_code)
+                delay = self.next_delay(response.status_code, response.headers, attempt, budget, statuses)
+                if delay is None:
+                    return response
+                logger.warning(f"{description} returned {response.status_code}, retrying in {delay:.1f}s ({budget.remaining} retries left)")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
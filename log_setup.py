@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_writer = None
+
+class LazyJSON:
+    """Log argument that is serialized only when the record is written.
+
+    Use it with %-style arguments so nothing is serialized on the calling
+    thread: logger.debug("payload: %s", LazyJSON(payload, indent=2)).
+    """
+
+    def __init__(self, obj, **kwargs):
+        self.obj = obj
+        self.kwargs = kwargs
+
+    def __str__(self):
+        try:
+            return json.dumps(self.obj, **self.kwargs)
+        except (TypeError, ValueError):
+            return repr(self.obj)
+
+class DeferredQueueHandler(logging.Handler):
+    """Puts records on a queue without formatting them.
+
+    Unlike logging.handlers.QueueHandler, which formats each record so it
+    can be pickled, the message, including any LazyJSON arguments, is
+    built on the writer thread. Not importing logging.handlers also keeps
+    the CLI's startup short.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__()
+        self.queue = log_queue
+
+    def emit(self, record):
+        self.queue.put(record)
+
+class QueueWriter:
+    """Background thread that passes queued records to the real handlers."""
+
+    def __init__(self, log_queue, handlers):
+        self.queue = log_queue
+        self.handlers = handlers
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """Write out everything queued so far and stop the thread."""
+        self.queue.put(None)
+        self._thread.join()
+        for handler in self.handlers:
+            handler.flush()
+
+class RotatingGzipFileHandler(logging.FileHandler):
+    """Log file that rotates into gzip-compressed backups.
+
+    When the file passes max_bytes it is compressed to <file>.1.gz, older
+    backups shift up to backup_count, and the file is truncated in place
+    under a lock. Several processes can therefore append to the same log.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5):
+        super().__init__(filename, mode="a", encoding="utf-8")
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def emit(self, record):
+        super().emit(record)
+        try:
+            if self.max_bytes and os.fstat(self.stream.fileno()).st_size >= self.max_bytes:
+                self.rotate()
+        except Exception:
+            self.handleError(record)
+
+    def rotate(self):
+        import gzip
+        import shutil
+        import portalocker
+        self.stream.flush()
+        with open(self.baseFilename + ".lock", "a") as lock_handle:
+            portalocker.lock(lock_handle, portalocker.LOCK_EX)
+            try:
+                # Another process may have rotated while this one waited
+                if os.path.getsize(self.baseFilename) < self.max_bytes:
+                    return
+                for i in range(self.backup_count - 1, 0, -1):
+                    backup = f"{self.baseFilename}.{i}.gz"
+                    if os.path.exists(backup):
+                        os.replace(backup, f"{self.baseFilename}.{i + 1}.gz")
+                if self.backup_count:
+                    with open(self.baseFilename, "rb") as src, gzip.open(f"{self.baseFilename}.1.gz", "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                with open(self.baseFilename, "r+b") as f:
+                    f.truncate(0)
+            finally:
+                portalocker.unlock(lock_handle)
+
+def setup_logging(log_file=None, level="DEBUG", max_bytes=10 * 1024 * 1024, backup_count=5, stream=False, handlers=()):
+    """Send the root logger's records through a queue to a background writer thread.
+
+    Writes to log_file with compressed rotation, to stderr if stream is
+    True, and to any extra handlers. Only the first call in a process
+    configures logging; later calls return the same root logger.
+    """
+    global _writer
+    logger = logging.getLogger()
+    if _writer is not None:
+        return logger
+    formatter = logging.Formatter(LOG_FORMAT)
+    targets = list(handlers)
+    if log_file:
+        targets.append(RotatingGzipFileHandler(log_file, max_bytes, backup_count))
+    if stream:
+        targets.append(logging.StreamHandler(sys.stderr))
+    for handler in targets:
+        if handler.formatter is None:
+            handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    logger.setLevel(level)
+    _writer = QueueWriter(log_queue, targets)
+    # Drain the queue before the interpreter exits, including after sys.exit()
+    atexit.register(_writer.stop)
+    return logger
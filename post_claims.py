@@ -0,0 +1,121 @@
+import time
+import logging
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    post_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    token INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fence (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    token INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO fence (id, token) VALUES (0, 0);
+CREATE TABLE IF NOT EXISTS members (
+    member_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+"""
+
+class ClaimStore(SQLiteStore):
+    """Time-limited leases on posts, kept in one SQLite file.
+
+    A claim belongs to one owner until it expires or is released. Every
+    successful claim gets a new fencing token from a counter that only
+    goes up. A holder can therefore check that it still owns the lease it
+    started with before doing anything irreversible.
+
+    The same file also tracks which scheduler instances are alive, so they
+    can split the schedule between them.
+    """
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self._connection().executescript(SCHEMA)
+
+    def claim(self, post_id, owner, ttl):
+        """Take the lease on a post for ttl seconds.
+
+        Returns the fencing token, or None if another owner holds an
+        unexpired lease.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM claims WHERE post_id = ?", (post_id,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return None
+            conn.execute("UPDATE fence SET token = token + 1 WHERE id = 0")
+            token = conn.execute("SELECT token FROM fence WHERE id = 0").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO claims (post_id, owner, token, expires_at) VALUES (?, ?, ?, ?)",
+                (post_id, owner, token, now + ttl)
+            )
+        return token
+
+    def renew(self, post_id, owner, token, ttl):
+        """Extend a lease that is still held; returns False if it was lost."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE claims SET expires_at = ? WHERE post_id = ? AND owner = ? AND token = ? AND expires_at > ?",
+                (now + ttl, post_id, owner, token, now)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, post_id, owner, token):
+        """Give up a lease; does nothing if it already passed to someone else."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM claims WHERE post_id = ? AND owner = ? AND token = ?", (post_id, owner, token))
+
+    def is_held(self, post_id, owner, token):
+        """Return True if owner still holds the lease identified by token."""
+        row = self._connection().execute(
+            "SELECT 1 FROM claims WHERE post_id = ? AND owner = ? AND token = ? AND expires_at > ?",
+            (post_id, owner, token, time.time())
+        ).fetchone()
+        return row is not None
+
+    def lease_expiry(self, post_id):
+        """Return when the unexpired lease on a post runs out, as a time.time() value, or None."""
+        row = self._connection().execute(
+            "SELECT expires_at FROM claims WHERE post_id = ? AND expires_at > ?", (post_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self):
+        """Delete expired leases; returns how many were removed."""
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM claims WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def heartbeat(self, member_id, ttl):
+        """Register member_id as alive for the next ttl seconds."""
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO members (member_id, expires_at) VALUES (?, ?)",
+                (member_id, time.time() + ttl)
+            )
+
+    def live_members(self):
+        """Return the sorted ids of members whose heartbeat has not expired."""
+        rows = self._connection().execute(
+            "SELECT member_id FROM members WHERE expires_at > ? ORDER BY member_id", (time.time(),)
+        )
+        return [member_id for (member_id,) in rows]
+
+    def leave(self, member_id):
+        """Remove a member so its share is reassigned immediately."""
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM members WHERE member_id = ?", (member_id,))
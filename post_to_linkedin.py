@@ -223,73 +223,212 @@
 
 
 
+# Only light standard library modules are imported before the daemon hand-off
+# below; the rest load after it, and pandas only when output.xlsx is updated.
+# benchmarks/startup_importtime.py checks the startup time.
 import sys
 import os
 import json
-import logging
-import time
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import pandas as pd
-from io import BytesIO
-from datetime import datetime
-import pytz
+from log_setup import setup_logging, LazyJSON
 
-# Set working directory to script location
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
-# Setup logging with explicit path
-log_file_path = os.path.join(os.getcwd(), "automation_log.txt")
-logging.basicConfig(
-    filename=log_file_path,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger()
+# Set working directory to script location when run as a batch script
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # Load config
 CONFIG_FILE = os.path.join(os.getcwd(), "config.json")
+config_error = None
 try:
     with open(CONFIG_FILE, "r") as f:
         config = json.load(f)
 except Exception as e:
-    logger.error(f"Error loading config.json at {CONFIG_FILE}: {e}")
-    sys.exit(1)
+    config = {}
+    config_error = e
 
-# Check required modules
-try:
-    import requests
-    import pandas
-except ImportError as e:
-    logger.error(f"Missing required module: {e}")
+# Setup logging with explicit path; records are written by a background thread
+log_file_path = os.path.join(os.getcwd(), "automation_log.txt")
+logger = setup_logging(
+    log_file_path,
+    level=config.get("LOG_LEVEL", "DEBUG"),
+    max_bytes=config.get("LOG_MAX_BYTES", 10 * 1024 * 1024),
+    backup_count=config.get("LOG_BACKUP_COUNT", 5)
+)
+if config_error is not None:
+    logger.error(f"Error loading config.json at {CONFIG_FILE}: {config_error}")
     sys.exit(1)
 
-# Initialize requests session with retries
+# Hand the post to a running posting daemon, which keeps its sessions and caches
+# warm; only when POSTER_DAEMON_PORT is set, so runs without one skip the connect
+POSTER_DAEMON_PORT = config.get("POSTER_DAEMON_PORT", 0)
+if __name__ == "__main__" and len(sys.argv) == 2 and sys.argv[1] != "--serve" and POSTER_DAEMON_PORT:
+    from poster_client import submit_to_daemon
+    result = submit_to_daemon(sys.argv[1], POSTER_DAEMON_PORT, config.get("POSTER_DAEMON_TIMEOUT", 600),
+                              connect_timeout=config.get("POSTER_DAEMON_CONNECT_TIMEOUT", 0.5))
+    if result is not None:
+        logger.info(f"Posting daemon result for Post_ID {sys.argv[1]}: {result}")
+        sys.exit(0 if result.get("success") else 1)
+
+import time
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from schedule_journal import ScheduleJournal
+from schedule_store import ScheduleStore
+from linkedin_cache import UserIdCache, AssetCache, token_key
+from linkedin_retry import RetryPolicy, CircuitBreaker, retry_after_seconds
+from rate_limiter import RateLimiter
+from workbook_sink import WorkbookSink
+import tracing
+
+# Initialize requests session; retries are left to retry_policy
 session = requests.Session()
-retries = Retry(
-    total=config.get("LINKEDIN_RETRIES", 3),
-    backoff_factor=config.get("LINKEDIN_RETRY_DELAY", 2),
-    status_forcelist=[401, 403, 429, 500, 502, 503, 504],
-    allowed_methods=["GET", "POST"]
+# Size the connection pool for the scheduler's in-process workers
+pool_size = config.get("POST_WORKERS", 4)
+session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+
+# Point the API calls elsewhere, e.g. at the stub servers in benchmarks/stub_servers.py
+LINKEDIN_API_BASE = config.get("LINKEDIN_API_BASE", "https://api.linkedin.com").rstrip("/")
+
+# One retry policy for every LinkedIn call: LINKEDIN_RETRIES is the budget for a whole publish
+retry_policy = RetryPolicy(
+    retries=config.get("LINKEDIN_RETRIES", 3),
+    base_delay=config.get("LINKEDIN_RETRY_DELAY", 2),
+    max_delay=config.get("LINKEDIN_RETRY_MAX_DELAY", 60),
+    breaker=CircuitBreaker(
+        failure_threshold=config.get("CIRCUIT_FAILURE_THRESHOLD", 5),
+        reset_timeout=config.get("CIRCUIT_RESET_TIMEOUT", 60)
+    ),
+    breaker_wait=config.get("CIRCUIT_MAX_WAIT", 120)
+)
+
+# Per-step timing spans for each publish, one trace per Post_ID. Off unless
+# TRACE_FILE names a file, since the export is appended to without limit
+trace_file = config.get("TRACE_FILE", "")
+tracing.configure(os.path.join(os.getcwd(), trace_file) if trace_file else None)
+
+# Posted flags for output.xlsx are queued and merged in batches by one writer
+workbook_sink = WorkbookSink(
+    os.path.join(os.getcwd(), "output.xlsx"),
+    debounce=config.get("OUTPUT_FLUSH_DEBOUNCE", 5),
+    max_delay=config.get("OUTPUT_FLUSH_MAX_DELAY", 60)
+)
+
+# Token buckets shared by every poster process on the host, see rate_limits()
+rate_limiter = RateLimiter(
+    os.path.join(os.getcwd(), config.get("RATE_LIMIT_DB", "rate_limits.db")),
+    recovery_seconds=config.get("RATE_LIMIT_RECOVERY", 300)
+)
+
+# "json" keeps schedule.json plus its journal, "sqlite" uses the indexed store
+SCHEDULE_BACKEND = config.get("SCHEDULE_BACKEND", "json")
+schedule_journal = None
+schedule_store = None
+if SCHEDULE_BACKEND == "sqlite":
+    schedule_store = ScheduleStore(os.path.join(os.getcwd(), config.get("SCHEDULE_DB", "schedule.db")))
+else:
+    # Status updates are appended to a journal instead of rewriting schedule.json
+    schedule_journal = ScheduleJournal(
+        os.path.join(os.getcwd(), config["SCHEDULE_FILE"]),
+        fsync_interval=config.get("JOURNAL_FSYNC_INTERVAL", 0.01),
+        compact_threshold=config.get("JOURNAL_COMPACT_THRESHOLD", 1000)
+    )
+
+# Relay image downloads to LinkedIn in chunks instead of buffering them
+STREAM_IMAGE_UPLOADS = config.get("STREAM_IMAGE_UPLOADS", True)
+UPLOAD_CHUNK_SIZE = config.get("UPLOAD_CHUNK_SIZE", 64 * 1024)
+
+# A token's user ID never changes, so skip the /rest/me round trip when cached
+user_id_cache = UserIdCache(
+    os.path.join(os.getcwd(), config.get("USER_ID_CACHE_FILE", "user_id_cache.json")),
+    config.get("USER_ID_CACHE_TTL", 7 * 24 * 3600)
+)
+
+# Repeat posts and retries reuse an image asset that was already uploaded
+asset_cache = AssetCache(
+    os.path.join(os.getcwd(), config.get("ASSET_CACHE_FILE", "asset_cache.json")),
+    config.get("ASSET_CACHE_TTL", 7 * 24 * 3600)
 )
-session.mount("https://", HTTPAdapter(max_retries=retries))
 
-def get_linkedin_user_id(access_token):
-    """Fetch LinkedIn user ID using the /rest/me API."""
+def get_account_config(account):
+    """Return the config overrides for an account from config["ACCOUNTS"]."""
+    if not account:
+        return {}
+    return config.get("ACCOUNTS", {}).get(account, {})
+
+def get_access_token(post):
+    """Return the access token for the account a post belongs to."""
+    account_config = get_account_config(post.get("Account"))
+    return account_config.get("LINKEDIN_ACCESS_TOKEN") or config.get("LINKEDIN_ACCESS_TOKEN")
+
+def linkedin_endpoint(url):
+    """Name the LinkedIn endpoint a URL belongs to, for RATE_LIMIT_ENDPOINTS."""
+    if "action=registerUpload" in url:
+        return "registerUpload"
+    if url.endswith("/ugcPosts"):
+        return "ugcPosts"
+    if url.endswith("/rest/me"):
+        return "me"
+    return "upload"
+
+def rate_limits(access_token, url):
+    """Return the rate limit buckets a request counts against, as {key: (per_minute, burst)}.
+
+    Every request counts against RATE_LIMIT_PER_MINUTE for its token. An
+    endpoint listed in RATE_LIMIT_ENDPOINTS, as a per-minute number or a
+    [per_minute, burst] pair, also has its own bucket per token.
+    """
+    burst = config.get("RATE_LIMIT_BURST", 10)
+    key = token_key(access_token)
+    limits = {}
+    per_minute = config.get("RATE_LIMIT_PER_MINUTE", 60)
+    if per_minute:
+        limits[key] = (per_minute, burst)
+    endpoint = linkedin_endpoint(url)
+    endpoint_limit = config.get("RATE_LIMIT_ENDPOINTS", {}).get(endpoint)
+    if isinstance(endpoint_limit, (int, float)):
+        endpoint_limit = (endpoint_limit, min(burst, max(endpoint_limit, 1)))
+    if endpoint_limit and endpoint_limit[0]:
+        limits[f"{key}|{endpoint}"] = tuple(endpoint_limit)
+    return limits
+
+def rate_limited(send, access_token, url):
+    """Wrap send() so it waits for rate limit capacity and tightens the limit on a 429."""
+    limits = rate_limits(access_token, url)
+
+    def send_when_allowed():
+        rate_limiter.acquire(limits)
+        response = send()
+        if response.status_code == 429:
+            rate_limiter.penalize(limits, retry_after_seconds(response.headers))
+        return response
+    return send_when_allowed
+
+def linkedin_request(method, url, budget=None, idempotent=True, **kwargs):
+    """Send a LinkedIn API request under the rate limiter and retry_policy; returns the final response.
+
+    Pass idempotent=False for requests that must not be repeated once
+    LinkedIn may have received them.
+    """
+    access_token = kwargs.get("headers", {}).get("Authorization", "").removeprefix("Bearer ")
+    send = rate_limited(lambda: session.request(method, url, **kwargs), access_token, url)
+    return retry_policy.send(send, budget, f"{method} {url.split('?')[0]}", idempotent)
+
+@tracing.traced("get_user_id")
+def get_linkedin_user_id(access_token, budget=None):
+    """Return the LinkedIn user ID for a token, from the cache or the /rest/me API."""
     if not access_token:
         logger.error("LinkedIn access token is empty.")
         return None
-    url = "https://api.linkedin.com/rest/me"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "X-Restli-Protocol-Version": "2.0.0",
-        "LinkedIn-Version": "202306"
-    }
+    user_id = user_id_cache.get(access_token)
+    if user_id:
+        logger.debug(f"Using cached LinkedIn user ID: {user_id}")
+        return user_id
+    url = f"{LINKEDIN_API_BASE}/rest/me"
+    headers = linkedin_headers(access_token)
     logger.debug(f"Sending GET request to {url}, Token (masked): {access_token[:10]}...")
     try:
-        response = session.get(url, headers=headers, timeout=10)
+        response = linkedin_request("GET", url, budget, headers=headers, timeout=10)
         response.raise_for_status()
         user_data = response.json()
         user_id = user_data.get("id")
@@ -297,6 +436,7 @@ def get_linkedin_user_id(access_token):
             logger.error("No 'id' found in LinkedIn /rest/me response.")
             return None
         logger.info(f"Fetched LinkedIn user ID: {user_id}")
+        user_id_cache.set(access_token, user_id)
         return user_id
     except requests.exceptions.HTTPError as e:
         logger.error(f"HTTP error fetching LinkedIn user ID: {e}, Status: {response.status_code}, Response: {response.text}")
@@ -305,25 +445,66 @@ def get_linkedin_user_id(access_token):
         logger.error(f"Error fetching LinkedIn user ID: {e}")
         return None
 
-def register_image_upload(access_token, user_id):
-    """Register an image upload with LinkedIn API."""
-    url = "https://api.linkedin.com/v2/assets?action=registerUpload"
-    headers = {
+def invalidate_on_unauthorized(access_token, response):
+    """Drop the cached user ID when LinkedIn rejects the token."""
+    if response is not None and response.status_code == 401:
+        logger.warning("LinkedIn returned 401, invalidating cached user ID for this token")
+        user_id_cache.invalidate(access_token)
+
+def linkedin_headers(access_token):
+    """Return the headers sent with LinkedIn API calls."""
+    return {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json",
         "X-Restli-Protocol-Version": "2.0.0",
         "LinkedIn-Version": "202306"
     }
-    payload = {
+
+def build_register_payload(user_id):
+    """Return the registerUpload request body for a feed image."""
+    return {
         "registerUploadRequest": {
             "recipes": ["urn:li:digitalmediaRecipe:feedshare-image"],
             "owner": f"urn:li:person:{user_id}",
             "serviceRelationships": [{"relationshipType": "OWNER", "identifier": "urn:li:userGeneratedContent"}]
         }
     }
-    logger.debug(f"Registering image upload, payload: {json.dumps(payload, indent=2)}...")
+
+def build_post_payload(user_id, text, asset_urn=None):
+    """Return the ugcPosts request body, with the image asset if there is one."""
+    if asset_urn:
+        media = [{
+            "status": "READY",
+            "media": asset_urn,
+            "title": {"text": "Shared Image"},
+            "description": {"text": "Image attached to post"}
+        }]
+        share_media_category = "IMAGE"
+    else:
+        media = []
+        share_media_category = None
+    return {
+        "author": f"urn:li:person:{user_id}",
+        "lifecycleState": "PUBLISHED",
+        "specificContent": {
+            "com.linkedin.ugc.ShareContent": {
+                "shareCommentary": {"text": text},
+                "shareMediaCategory": share_media_category,
+                "media": media
+            }
+        },
+        "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
+    }
+
+@tracing.traced("register_upload", ok=lambda result: result[0] is not None)
+def register_image_upload(access_token, user_id, budget=None):
+    """Register an image upload with LinkedIn API."""
+    url = f"{LINKEDIN_API_BASE}/v2/assets?action=registerUpload"
+    headers = linkedin_headers(access_token)
+    payload = build_register_payload(user_id)
+    logger.debug("Registering image upload, payload: %s...", LazyJSON(payload, indent=2))
     try:
-        response = session.post(url, headers=headers, json=payload, timeout=10)
+        response = linkedin_request("POST", url, budget, headers=headers, json=payload, timeout=10)
         response.raise_for_status()
         data = response.json()
         upload_url = data["value"]["uploadMechanism"]["com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest"]["uploadUrl"]
@@ -333,161 +514,448 @@ def register_image_upload(access_token, user_id):
         return upload_url, asset_urn, media_artifact
     except requests.exceptions.HTTPError as e:
         logger.error(f"HTTP error registering image upload: {e}, Status: {response.status_code}, Response: {response.text}")
+        invalidate_on_unauthorized(access_token, response)
         return None, None, None
     except Exception as e:
         logger.error(f"Error registering image upload: {e}")
         return None, None, None
 
-def upload_image(image_url, upload_url, access_token):
-    """Upload image binary to LinkedIn using the upload URL."""
-    logger.debug(f"Fetching image from {image_url} for upload...")
+class ImageSourceError(Exception):
+    """The image could not be fetched from its source; not a LinkedIn failure."""
+
+def open_image_source(image_url):
+    """Start downloading an image for upload; raises ImageSourceError if its host fails."""
     try:
-        response = session.get(image_url, timeout=10)
-        response.raise_for_status()
-        headers = {"Authorization": f"Bearer {access_token}"}
-        upload_response = session.post(upload_url, headers=headers, data=response.content, timeout=10)
+        response = session.get(image_url, timeout=10, stream=STREAM_IMAGE_UPLOADS)
+    except requests.exceptions.RequestException as e:
+        raise ImageSourceError(f"Error fetching image {image_url}: {e}") from e
+    if not response.ok:
+        response.close()
+        raise ImageSourceError(f"HTTP error fetching image {image_url}, Status: {response.status_code}")
+    return response
+
+class StreamedBody:
+    """Request body that relays a streamed download in fixed-size chunks.
+
+    requests sends a Content-Length taken from __len__ when the source
+    reported one, and falls back to chunked transfer encoding otherwise.
+    """
+
+    def __init__(self, raw, content_length, chunk_size):
+        self.raw = raw
+        self.length = int(content_length) if content_length else 0
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self.raw.stream(self.chunk_size, decode_content=False)
+
+    def __len__(self):
+        return self.length
+
+@tracing.traced("image_upload")
+def upload_image(image_url, upload_url, access_token, content=None, budget=None):
+    """Upload image binary to LinkedIn using the upload URL.
+
+    With STREAM_IMAGE_UPLOADS the download is passed to the upload in
+    UPLOAD_CHUNK_SIZE chunks, so memory stays bounded and the two
+    transfers overlap. Content-encoded downloads are buffered instead,
+    because their raw bytes are not the image. If content is given it is
+    uploaded without downloading again. A streamed upload is retried by
+    downloading the image again. Failures of the image host are reported
+    as such and never count against the LinkedIn circuit breaker.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+    upload_response = None
+    if content is not None:
+        try:
+            upload_response = linkedin_request("POST", upload_url, budget, headers=headers, data=content, timeout=10)
+            upload_response.raise_for_status()
+            logger.info(f"Successfully uploaded image from {image_url}")
+            return True
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP error uploading image: {e}, Status: {upload_response.status_code}, Response: {upload_response.text}")
+            return False
+        except Exception as e:
+            logger.error(f"Error uploading image: {e}")
+            return False
+
+    sources = []
+
+    def send():
+        # The first download is checked before any LinkedIn request; retries fetch the image again
+        with sources.pop() if sources else open_image_source(image_url) as response:
+            if STREAM_IMAGE_UPLOADS and not response.headers.get("Content-Encoding"):
+                data = StreamedBody(response.raw, response.headers.get("Content-Length"), UPLOAD_CHUNK_SIZE)
+            else:
+                data = response.content
+            return session.post(upload_url, headers=headers, data=data, timeout=10)
+
+    try:
+        logger.debug(f"Fetching image from {image_url} for upload...")
+        sources.append(open_image_source(image_url))
+        upload_response = retry_policy.send(rate_limited(send, access_token, upload_url), budget, "Image upload")
         upload_response.raise_for_status()
         logger.info(f"Successfully uploaded image from {image_url}")
         return True
     except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP error uploading image: {e}, Status: {upload_response.status_code}, Response: {upload_response.text}")
+        failed = upload_response if upload_response is not None else e.response
+        logger.error(f"HTTP error uploading image: {e}, Status: {failed.status_code}, Response: {failed.text}")
+        return False
+    except ImageSourceError as e:
+        logger.error(str(e))
         return False
     except Exception as e:
         logger.error(f"Error uploading image: {e}")
         return False
+    finally:
+        for response in sources:
+            response.close()
 
-def post_to_linkedin(post_id):
-    """Post content with optional image to LinkedIn using v2/ugcPosts endpoint."""
-    logger.info(f"Attempting to post Post_ID: {post_id} via batch script")
-    
-    # Log environment details
-    logger.debug(f"Current working directory: {os.getcwd()}")
-    logger.debug(f"PYTHONPATH: {os.environ.get('PYTHONPATH', 'Not set')}")
-    logger.debug(f"Current user: {os.getlogin()}")
-    logger.debug(f"Command line args: {sys.argv}")
-    logger.debug(f"Python executable: {sys.executable}")
-    logger.debug(f"Script path: {os.path.abspath(__file__)}")
-    
+@tracing.traced("image_fingerprint", ok=lambda result: result[0] is not None)
+def image_fingerprint(image_url):
+    """Identify the current version of an image; returns (fingerprint, content).
+
+    Uses the URL with its ETag, or Last-Modified and length, from a HEAD
+    request. Without those validators the image is downloaded and hashed,
+    and its bytes are returned so they are not fetched twice.
+    """
+    try:
+        response = session.head(image_url, timeout=10, allow_redirects=True)
+        if response.ok:
+            etag = response.headers.get("ETag")
+            if etag:
+                return f"{image_url}|etag:{etag}", None
+            last_modified = response.headers.get("Last-Modified")
+            length = response.headers.get("Content-Length")
+            if last_modified and length:
+                return f"{image_url}|lm:{last_modified}|len:{length}", None
+    except Exception as e:
+        logger.debug(f"HEAD {image_url} failed, hashing image bytes instead: {e}")
+    try:
+        response = session.get(image_url, timeout=10)
+        response.raise_for_status()
+        return f"sha256:{hashlib.sha256(response.content).hexdigest()}", response.content
+    except Exception as e:
+        logger.error(f"Error fetching image {image_url}: {e}")
+        return None, None
+
+@tracing.traced("image_asset", ok=lambda result: result[0] is not None)
+def get_image_asset(access_token, user_id, image_url, budget=None):
+    """Return (asset_urn, fingerprint) for an image, uploading it only if no cached asset matches."""
+    fingerprint, content = image_fingerprint(image_url)
+    if fingerprint:
+        asset_urn = asset_cache.get(user_id, fingerprint)
+        if asset_urn:
+            logger.info(f"Reusing uploaded asset {asset_urn} for {image_url}")
+            return asset_urn, fingerprint
+    upload_url, asset_urn, _ = register_image_upload(access_token, user_id, budget)
+    if not upload_url or not asset_urn:
+        logger.error(f"Failed to register image upload for {image_url}")
+        return None, fingerprint
+    if not upload_image(image_url, upload_url, access_token, content=content, budget=budget):
+        logger.error(f"Failed to upload image {image_url}")
+        return None, fingerprint
+    if fingerprint:
+        asset_cache.set(user_id, fingerprint, asset_urn)
+    return asset_urn, fingerprint
+
+@tracing.traced("publish", root=True)
+def publish_post(post_id, fence=None):
+    """Post content with optional image to LinkedIn using v2/ugcPosts endpoint.
+
+    Returns True on success and False on failure, so the scheduler can call
+    it in-process from its worker pool. fence, if given, is called right
+    before the post is published and must return True for it to go ahead.
+    All requests made for the post share one retry budget. A post that is
+    already marked as posted is not published again.
+    """
     # Load schedule
-    scheduled_posts = load_schedule()
-    post = next((p for p in scheduled_posts if p["Post_ID"] == post_id), None)
+    post = get_scheduled_post(post_id)
     if not post:
-        logger.error(f"Post_ID {post_id} not found in schedule.json")
-        sys.exit(1)
+        logger.error(f"Post_ID {post_id} not found in the schedule")
+        return False
+    if post.get("Posted"):
+        logger.warning(f"Post_ID {post_id} is already posted, not publishing it again")
+        return True
     
     # Post to LinkedIn with retry
-    access_token = config.get("LINKEDIN_ACCESS_TOKEN")
+    access_token = get_access_token(post)
     if not access_token:
-        logger.error("LinkedIn access token missing in config.json")
-        sys.exit(1)
+        logger.error(f"LinkedIn access token missing in config.json for account {post.get('Account', 'default')}")
+        return False
     
-    user_id = get_linkedin_user_id(access_token)
+    budget = retry_policy.budget()
+    user_id = get_linkedin_user_id(access_token, budget)
     if user_id:
         logger.debug(f"Posting content: {post['Output_Text'][:50]}...")
         image_url = post.get("image")
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            if image_url:
-                upload_url, asset_urn, _ = register_image_upload(access_token, user_id)
-                if not upload_url or not asset_urn:
-                    logger.error(f"Failed to register image upload on attempt {attempt + 1}/{max_attempts}")
-                    continue
-                if not upload_image(image_url, upload_url, access_token):
-                    logger.error(f"Failed to upload image on attempt {attempt + 1}/{max_attempts}")
-                    continue
-                media = [{
-                    "status": "READY",
-                    "media": asset_urn,
-                    "title": {"text": "Shared Image"},
-                    "description": {"text": "Image attached to post"}
-                }]
-                share_media_category = "IMAGE"
-            else:
-                media = []
-                share_media_category = None
-
-            url = "https://api.linkedin.com/v2/ugcPosts"
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-                "X-Restli-Protocol-Version": "2.0.0",
-                "LinkedIn-Version": "202306"
-            }
-            payload = {
-                "author": f"urn:li:person:{user_id}",
-                "lifecycleState": "PUBLISHED",
-                "specificContent": {
-                    "com.linkedin.ugc.ShareContent": {
-                        "shareCommentary": {"text": post["Output_Text"]},
-                        "shareMediaCategory": share_media_category,
-                        "media": media if image_url else []
-                    }
-                },
-                "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
-            }
-            logger.debug(f"Sending POST request to {url}, payload: {json.dumps(payload, indent=2)}...")
+        fingerprint = None
+        asset_urn = staged_asset(post)
+        if asset_urn:
+            # Uploaded ahead of time by the scheduler, only the ugcPosts call is left
+            logger.info(f"Using pre-staged asset {asset_urn} for Post_ID {post_id}")
+        while True:
+            if image_url and not asset_urn:
+                asset_urn, fingerprint = get_image_asset(access_token, user_id, image_url, budget)
+                if not asset_urn:
+                    logger.error(f"Failed to register or upload image for Post_ID {post_id}, posting failed")
+                    return False
+
+            url = f"{LINKEDIN_API_BASE}/v2/ugcPosts"
+            headers = linkedin_headers(access_token)
+            payload = build_post_payload(user_id, post["Output_Text"], asset_urn)
+            if fence and not fence():
+                logger.error(f"Lost claim on Post_ID {post_id}, not publishing")
+                return False
+            logger.debug("Sending POST request to %s, payload: %s...", url, LazyJSON(payload, indent=2))
             try:
-                response = session.post(url, headers=headers, json=payload, timeout=10)
-                response.raise_for_status()
+                with tracing.span("ugc_post") as current:
+                    # A lost response may hide a published post, so never resend it blindly
+                    response = linkedin_request("POST", url, budget, idempotent=False, headers=headers, json=payload, timeout=10)
+                    current.set_attribute("http.status_code", response.status_code)
+                    response.raise_for_status()
                 logger.info(f"Successfully posted to LinkedIn with{'out' if not image_url else ''} image: {post['Output_Text'][:50]}...")
-                post["Posted"] = True
-                save_schedule(scheduled_posts)
-                try:
-                    output_file = os.path.join(os.getcwd(), "output.xlsx")
-                    if os.path.exists(output_file):
-                        df = pd.read_excel(output_file)
-                        df.loc[df['Post_ID'] == post_id, 'Posted'] = True
-                        output_buffer = BytesIO()
-                        df.to_excel(output_buffer, index=False)
-                        with open(output_file, "wb") as f:
-                            f.write(output_buffer.getvalue())
-                        logger.info(f"Updated output.xlsx for Post_ID {post_id}")
-                    else:
-                        logger.error(f"output.xlsx not found at {output_file}")
-                except Exception as e:
-                    logger.error(f"Error updating output.xlsx for Post_ID {post_id}: {e}")
-                sys.exit(0)  # Success, exit
+                mark_posted(post_id)
+                update_output_workbook(post_id)
+                return True
             except requests.exceptions.HTTPError as e:
-                logger.error(f"HTTP error posting to LinkedIn on attempt {attempt + 1}/{max_attempts}: {e}, Status: {response.status_code}, Response: {response.text}")
-                if attempt == max_attempts - 1:
-                    logger.error(f"Max retries reached for Post_ID {post_id}, posting failed")
-                    sys.exit(1)
-                time.sleep(5)  # Wait before retry
+                logger.error(f"HTTP error posting to LinkedIn: {e}, Status: {response.status_code}, Response: {response.text}")
+                invalidate_on_unauthorized(access_token, response)
+                if asset_urn and response.status_code in (400, 404, 422) and budget.take():
+                    # The asset may be stale or unusable; upload it again if the budget allows
+                    if fingerprint:
+                        asset_cache.invalidate(user_id, fingerprint)
+                    asset_urn = fingerprint = None
+                    continue
+                logger.error(f"Posting failed for Post_ID {post_id}")
+                return False
             except Exception as e:
-                logger.error(f"Error posting to LinkedIn on attempt {attempt + 1}/{max_attempts}: {e}")
-                if attempt == max_attempts - 1:
-                    logger.error(f"Max retries reached for Post_ID {post_id}, posting failed")
-                    sys.exit(1)
-                time.sleep(5)
+                logger.error(f"Error posting to LinkedIn for Post_ID {post_id}: {e}")
+                return False
     else:
         logger.error(f"Failed to fetch user ID for Post_ID {post_id}")
-        sys.exit(1)
+        return False
+
+def staged_asset(post):
+    """Return the Asset_URN stage_media uploaded for the post's current image, or None."""
+    image_url = post.get("image")
+    if image_url and post.get("Asset_URN") and post.get("Asset_Image") == image_url:
+        return post["Asset_URN"]
+    return None
+
+@tracing.traced("stage_media", root=True)
+def stage_media(post_id):
+    """Upload a scheduled post's image ahead of time and store its asset URN with the post.
+
+    publish_post uses the stored Asset_URN while Asset_Image still matches
+    the post's image, so publishing only has to create the ugcPost.
+    Returns True if the post has nothing left to stage.
+    """
+    post = get_scheduled_post(post_id)
+    if not post:
+        logger.error(f"Post_ID {post_id} not found in the schedule")
+        return False
+    image_url = post.get("image")
+    if post.get("Posted") or not image_url or staged_asset(post):
+        return True
+    access_token = get_access_token(post)
+    if not access_token:
+        logger.error(f"LinkedIn access token missing in config.json for account {post.get('Account', 'default')}")
+        return False
+    budget = retry_policy.budget()
+    user_id = get_linkedin_user_id(access_token, budget)
+    if not user_id:
+        logger.error(f"Failed to fetch user ID for staging Post_ID {post_id}")
+        return False
+    asset_urn, _ = get_image_asset(access_token, user_id, image_url, budget)
+    if not asset_urn:
+        logger.error(f"Failed to stage image for Post_ID {post_id}, it will be uploaded at publish time")
+        return False
+    update_post(post_id, Asset_URN=asset_urn, Asset_Image=image_url)
+    logger.info(f"Staged image for Post_ID {post_id} as {asset_urn}")
+    return True
+
+def update_output_workbook(post_id):
+    """Queue the Posted flag for output.xlsx; workbook_sink merges it later."""
+    try:
+        workbook_sink.record(post_id, Posted=True)
+        logger.info(f"Queued output.xlsx update for Post_ID {post_id}")
+    except Exception as e:
+        logger.error(f"Error queueing output.xlsx update for Post_ID {post_id}: {e}")
+
+def log_environment():
+    """Log how the batch script was started, for debugging scheduled runs."""
+    import getpass
+    logger.debug(f"Current working directory: {os.getcwd()}")
+    logger.debug(f"PYTHONPATH: {os.environ.get('PYTHONPATH', 'Not set')}")
+    logger.debug(f"Current user: {getpass.getuser()}")
+    logger.debug(f"Command line args: {sys.argv}")
+    logger.debug(f"Python executable: {sys.executable}")
+    logger.debug(f"Script path: {os.path.abspath(__file__)}")
+
+def post_to_linkedin(post_id):
+    """Batch script entry point: publish a post and exit with its status."""
+    logger.info(f"Attempting to post Post_ID: {post_id} via batch script")
+    if config.get("LOG_ENVIRONMENT", False):
+        log_environment()
+    success = publish_post(post_id)
+    if not success and not config.get("LOG_ENVIRONMENT", False):
+        # Environment details are only worth writing when something went wrong
+        log_environment()
+    if success and config.get("OUTPUT_FLUSH_ON_EXIT", True):
+        # No long-running process may be around to merge the update
+        try:
+            workbook_sink.flush(wait=True)
+        except Exception as e:
+            logger.error(f"Error merging status updates into output.xlsx: {e}")
+    sys.exit(0 if success else 1)
+
+def serve(port=None, host="127.0.0.1"):
+    """Run as a posting daemon that keeps the session, config and caches warm.
+
+    POST /publish with {"Post_ID": ...} publishes the post and returns
+    {"Post_ID", "success", "duration_seconds"}. A post that is already
+    being published is not started again; the second request gets the
+    same result. GET /health reports that the daemon is up.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    port = port or POSTER_DAEMON_PORT
+    executor = ThreadPoolExecutor(max_workers=config.get("POST_WORKERS", 4), thread_name_prefix="daemon-worker")
+    publishing = {}
+    publishing_lock = threading.Lock()
+
+    def publish(post_id):
+        started = time.monotonic()
+        try:
+            success = publish_post(post_id)
+        except Exception as e:
+            logger.error(f"Unexpected error publishing Post_ID {post_id}: {e}")
+            success = False
+        return {"Post_ID": post_id, "success": success, "duration_seconds": round(time.monotonic() - started, 3)}
+
+    def forget(post_id):
+        with publishing_lock:
+            publishing.pop(post_id, None)
+
+    def submit(post_id):
+        with publishing_lock:
+            future = publishing.get(post_id)
+            if future is None:
+                future = publishing[post_id] = executor.submit(publish, post_id)
+                future.add_done_callback(lambda f: forget(post_id))
+        return future.result()
+
+    class DaemonHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self.send_json(404, {"error": "Not found"})
+                return
+            self.send_json(200, {"status": "ok", "pid": os.getpid(), "publishing": len(publishing)})
+
+        def do_POST(self):
+            if self.path != "/publish":
+                self.send_json(404, {"error": "Not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                post_id = str(body["Post_ID"])
+            except (ValueError, KeyError, TypeError):
+                self.send_json(400, {"success": False, "error": "Expected a JSON body with a Post_ID"})
+                return
+            if get_scheduled_post(post_id) is None:
+                self.send_json(404, {"Post_ID": post_id, "success": False, "error": "Post_ID not found in the schedule"})
+                return
+            logger.info(f"Posting daemon received Post_ID: {post_id}")
+            self.send_json(200, submit(post_id))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), DaemonHandler)
+    server.daemon_threads = True
+    workbook_sink.start()
+    logger.info(f"Posting daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Posting daemon stopped")
+    finally:
+        server.server_close()
+        executor.shutdown(wait=True)
+
+def get_schedule_location():
+    """Return the path of the schedule file or database in use."""
+    return schedule_store.db_path if schedule_store else schedule_journal.schedule_file
 
 def load_schedule():
-    """Load scheduled posts from schedule.json."""
-    schedule_file = os.path.join(os.getcwd(), config["SCHEDULE_FILE"])
+    """Load scheduled posts from the store, or from schedule.json with the journal replayed."""
     try:
-        if os.path.exists(schedule_file):
-            with open(schedule_file, "r") as f:
-                return json.load(f)
-        logger.warning(f"{schedule_file} not found.")
-        return []
+        if schedule_store:
+            return schedule_store.load()
+        return schedule_journal.load()
     except Exception as e:
-        logger.error(f"Error loading schedule.json at {schedule_file}: {e}")
+        logger.error(f"Error loading schedule at {get_schedule_location()}: {e}")
         return []
 
+def get_scheduled_post(post_id):
+    """Return one scheduled post by Post_ID, or None."""
+    if schedule_store:
+        try:
+            return schedule_store.get(post_id)
+        except Exception as e:
+            logger.error(f"Error reading Post_ID {post_id} from {schedule_store.db_path}: {e}")
+            return None
+    try:
+        return schedule_journal.get(post_id)
+    except Exception as e:
+        logger.error(f"Error reading Post_ID {post_id} from {schedule_journal.schedule_file}: {e}")
+        return None
+
 def save_schedule(scheduled_posts):
-    """Save scheduled posts to schedule.json."""
-    schedule_file = os.path.join(os.getcwd(), config["SCHEDULE_FILE"])
+    """Replace the whole schedule: atomically for schedule.json, in one transaction for SQLite."""
     try:
-        with open(schedule_file, "w") as f:
-            json.dump(scheduled_posts, f, indent=2)
-        logger.info(f"Saved {len(scheduled_posts)} scheduled posts to {schedule_file}")
+        if schedule_store:
+            schedule_store.replace_all(scheduled_posts)
+        else:
+            schedule_journal.write_snapshot(scheduled_posts)
+        logger.info(f"Saved {len(scheduled_posts)} scheduled posts to {get_schedule_location()}")
     except Exception as e:
-        logger.error(f"Error saving schedule.json at {schedule_file}: {e}")
+        logger.error(f"Error saving schedule at {get_schedule_location()}: {e}")
+
+def update_post(post_id, **fields):
+    """Record changed fields of one post; returns True on success."""
+    try:
+        if schedule_store:
+            schedule_store.update(post_id, **fields)
+        else:
+            schedule_journal.append(post_id, **fields)
+        return True
+    except Exception as e:
+        logger.error(f"Error recording {', '.join(fields)} for Post_ID {post_id}: {e}")
+        return False
+
+def mark_posted(post_id):
+    """Record that one post has been published."""
+    if update_post(post_id, Posted=True):
+        logger.info(f"Marked Post_ID {post_id} as posted in {get_schedule_location()}")
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
-        logger.error("Usage: python post_to_linkedin.py <Post_ID>")
+        logger.error("Usage: python post_to_linkedin.py <Post_ID> | --serve")
         sys.exit(1)
-    post_to_linkedin(sys.argv[1])
\ No newline at end of file
+    if sys.argv[1] == "--serve":
+        if not POSTER_DAEMON_PORT:
+            logger.error("Set POSTER_DAEMON_PORT in config.json to run the posting daemon")
+            sys.exit(1)
+        serve()
+    else:
+        post_to_linkedin(sys.argv[1])
\ No newline at end of file
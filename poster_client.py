@@ -0,0 +1,40 @@
+import json
+import socket
+
+def submit_to_daemon(post_id, port, timeout=600, host="127.0.0.1", connect_timeout=0.5):
+    """Ask a running posting daemon to publish a post.
+
+    Returns the daemon's result dict, or None if no daemon is listening,
+    in which case the caller can publish the post itself. A refused
+    connection can take seconds to report on Windows, so a connect that
+    takes longer than connect_timeout also counts as no daemon. The request is
+    written on a plain socket because importing urllib.request alone
+    would double the CLI's startup time.
+    """
+    body = json.dumps({"Post_ID": post_id}).encode("utf-8")
+    request = (
+        f"POST /publish HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    ).encode("ascii") + body
+    try:
+        conn = socket.create_connection((host, port), timeout=connect_timeout)
+    except (ConnectionRefusedError, socket.timeout):
+        return None
+    except OSError as e:
+        return {"Post_ID": post_id, "success": False, "error": f"Posting daemon unreachable: {e}"}
+    try:
+        with conn:
+            conn.settimeout(timeout)
+            conn.sendall(request)
+            response = conn.makefile("rb")
+            status = int(response.readline().split()[1])
+            while response.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            data = response.read()
+        try:
+            return json.loads(data)
+        except ValueError:
+            return {"Post_ID": post_id, "success": False, "error": f"HTTP {status} from posting daemon"}
+    except Exception as e:
+        # The daemon may still be publishing, so do not fall back to posting here
+        return {"Post_ID": post_id, "success": False, "error": f"Error waiting for posting daemon: {e}"}
@@ -0,0 +1,100 @@
+import time
+import logging
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class RateLimiter(SQLiteStore):
+    """Token buckets shared by every process that opens the same SQLite file.
+
+    Each request takes one token from every bucket it belongs to, for
+    example one per access token and one per access token and endpoint.
+    limits maps a bucket key to (requests per minute, burst). When a 429
+    comes back, penalize() halves the bucket's rate and drains it. The
+    rate then recovers linearly to its configured value over
+    recovery_seconds.
+    """
+
+    def __init__(self, db_path, recovery_seconds=300, min_rate_per_minute=1):
+        super().__init__(db_path)
+        self.recovery_seconds = recovery_seconds
+        self.min_rate = min_rate_per_minute / 60
+        self._connection().executescript(SCHEMA)
+
+    def _refill(self, conn, key, limit, now):
+        """Return the bucket's (tokens, rate) brought forward to now."""
+        per_minute, burst = limit
+        full_rate = per_minute / 60
+        row = conn.execute("SELECT tokens, rate, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return float(burst), full_rate
+        tokens, rate, updated_at = row
+        elapsed = max(now - updated_at, 0)
+        # Credit the elapsed time at the tightened rate, then let the rate recover
+        tokens = min(tokens + elapsed * rate, burst)
+        rate = min(rate + full_rate * elapsed / self.recovery_seconds, full_rate)
+        return tokens, rate
+
+    def try_acquire(self, limits):
+        """Take one token from every bucket in limits if all have one.
+
+        Returns 0 on success, otherwise the number of seconds until the
+        emptiest bucket has a token again.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            buckets = {key: self._refill(conn, key, limit, now) for key, limit in limits.items()}
+            wait = max((1 - tokens) / rate for tokens, rate in buckets.values())
+            if wait > 0:
+                return wait
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, rate, updated_at) VALUES (?, ?, ?, ?)",
+                [(key, tokens - 1, rate, now) for key, (tokens, rate) in buckets.items()]
+            )
+        return 0
+
+    def acquire(self, limits):
+        """Wait until every bucket in limits has a token and take them."""
+        if not limits:
+            return
+        waited = False
+        while True:
+            wait = self.try_acquire(limits)
+            if wait == 0:
+                return
+            if not waited:
+                logger.info(f"Rate limit reached, waiting {wait:.1f}s for capacity")
+                waited = True
+            time.sleep(wait)
+
+    def penalize(self, limits, retry_after=None):
+        """Tighten the buckets in limits after a 429.
+
+        Halves their rate and drains them. With retry_after, the next token
+        becomes available once that many seconds have passed.
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = []
+            for key, limit in limits.items():
+                _, rate = self._refill(conn, key, limit, now)
+                rate = max(rate / 2, self.min_rate)
+                tokens = 1 - retry_after * rate if retry_after else 0
+                rows.append((key, tokens, rate, now))
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, rate, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+        logger.warning(f"LinkedIn returned 429, tightened {len(rows)} rate limit buckets to half their rate")
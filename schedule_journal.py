@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import logging
+import threading
+import portalocker
+
+logger = logging.getLogger()
+
+class ScheduleJournal:
+    """Schedule file plus an append-only journal of per-post status updates.
+
+    schedule.json stays the snapshot. Status changes are appended to
+    schedule.json.journal as one JSON line each and made durable with a
+    group fsync. A background compaction folds the journal back into the
+    snapshot. Appends take a shared lock on schedule.json.lock and
+    compaction an exclusive one, so several processes can share a journal.
+
+    Reads go through an in-memory index of the snapshot. It is parsed
+    again only when schedule.json is replaced, and otherwise just the
+    journal records appended since the last read are applied to it, so
+    looking up one post does not reparse the whole schedule.
+    """
+
+    def __init__(self, schedule_file, fsync_interval=0.01, compact_threshold=1000):
+        self.schedule_file = schedule_file
+        self.journal_file = schedule_file + ".journal"
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self._lock_handle = open(schedule_file + ".lock", "a")
+        self._fd = os.open(self.journal_file, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._end_torn_line()
+        self._cond = threading.Condition()
+        self._written = 0
+        self._synced = 0
+        self._since_compaction = 0
+        self._compacting = False
+        # (snapshot signature, {Post_ID: post}, bytes of the journal applied)
+        self._index = None
+        self._index_lock = threading.Lock()
+        threading.Thread(target=self._flush_loop, name="journal-fsync", daemon=True).start()
+
+    def _end_torn_line(self):
+        """Terminate a torn last line left by a crash, so the next record starts on its own line."""
+        portalocker.lock(self._lock_handle, portalocker.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size and os.pread(self._fd, 1, size - 1) != b"\n":
+                logger.warning(f"{self.journal_file} ends in a torn record, starting a new line")
+                os.write(self._fd, b"\n")
+                os.fsync(self._fd)
+        finally:
+            portalocker.unlock(self._lock_handle)
+
+    def _flush_loop(self):
+        """Fsync the journal in groups and wake the appenders waiting on it."""
+        while True:
+            with self._cond:
+                while self._synced == self._written:
+                    self._cond.wait()
+            # Give concurrent appenders a moment to join this fsync
+            time.sleep(self.fsync_interval)
+            with self._cond:
+                target = self._written
+            try:
+                os.fsync(self._fd)
+            except OSError as e:
+                logger.error(f"Error syncing {self.journal_file}: {e}")
+            with self._cond:
+                self._synced = max(self._synced, target)
+                self._cond.notify_all()
+
+    def append(self, post_id, wait=True, **fields):
+        """Record new field values for a post, e.g. append(post_id, Posted=True).
+
+        With wait=True, returns once the record has been fsynced.
+        """
+        record = {"Post_ID": post_id, "set": fields, "ts": time.time()}
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._cond:
+            portalocker.lock(self._lock_handle, portalocker.LOCK_SH)
+            try:
+                os.write(self._fd, line)
+            finally:
+                portalocker.unlock(self._lock_handle)
+            self._written += 1
+            seq = self._written
+            self._since_compaction += 1
+            start_compaction = self._since_compaction >= self.compact_threshold and not self._compacting
+            if start_compaction:
+                self._compacting = True
+            self._cond.notify_all()
+            if wait:
+                while self._synced < seq:
+                    self._cond.wait()
+        if start_compaction:
+            threading.Thread(target=self._compact_in_background, name="journal-compact", daemon=True).start()
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.schedule_file):
+            logger.warning(f"{self.schedule_file} not found.")
+            return []
+        with open(self.schedule_file, "r") as f:
+            return json.load(f)
+
+    def _snapshot_signature(self):
+        try:
+            st = os.stat(self.schedule_file)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh_index(self):
+        """Bring the index up to date and return it; caller holds _index_lock and a shared lock."""
+        signature = self._snapshot_signature()
+        if self._index is None or self._index[0] != signature:
+            # Compaction and write_snapshot replace the snapshot and empty the journal together
+            posts_by_id = {post.get("Post_ID"): post for post in self._read_snapshot()}
+            self._index = (signature, posts_by_id, 0)
+        signature, posts_by_id, offset = self._index
+        try:
+            with open(self.journal_file, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b""
+        # Leave a record that is still being written for the next read
+        end = tail.rfind(b"\n") + 1
+        for line in tail[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable record in {self.journal_file}")
+                continue
+            post = posts_by_id.get(record.get("Post_ID"))
+            if post is not None:
+                post.update(record.get("set", {}))
+        self._index = (signature, posts_by_id, offset + end)
+        return posts_by_id
+
+    def _read_index(self, read):
+        with self._index_lock:
+            portalocker.lock(self._lock_handle, portalocker.LOCK_SH)
+            try:
+                return read(self._refresh_index())
+            finally:
+                portalocker.unlock(self._lock_handle)
+
+    def get(self, post_id):
+        """Return a copy of one post with the journal applied, or None.
+
+        Raises if the snapshot cannot be read.
+        """
+        return self._read_index(lambda posts_by_id: dict(posts_by_id[post_id]) if post_id in posts_by_id else None)
+
+    def _replay(self, scheduled_posts):
+        """Apply journal records to scheduled_posts in place; return how many were read."""
+        posts_by_id = {post.get("Post_ID"): post for post in scheduled_posts}
+        count = 0
+        try:
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a torn last line; skip it
+                        logger.warning(f"Skipping unreadable record in {self.journal_file}")
+                        continue
+                    count += 1
+                    post = posts_by_id.get(record.get("Post_ID"))
+                    if post is not None:
+                        post.update(record.get("set", {}))
+        except FileNotFoundError:
+            pass
+        return count
+
+    def load(self):
+        """Return the schedule snapshot with the journal replayed on top.
+
+        Raises if the snapshot cannot be read.
+        """
+        return self._read_index(lambda posts_by_id: [dict(post) for post in posts_by_id.values()])
+
+    def _write_snapshot_locked(self, scheduled_posts):
+        """Atomically replace the snapshot and empty the journal; caller holds the lock."""
+        tmp_file = self.schedule_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(scheduled_posts, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.schedule_file)
+        os.truncate(self.journal_file, 0)
+
+    def write_snapshot(self, scheduled_posts):
+        """Replace the whole schedule, folding in and clearing the journal."""
+        with self._cond:
+            portalocker.lock(self._lock_handle, portalocker.LOCK_EX)
+            try:
+                self._write_snapshot_locked(scheduled_posts)
+                self._since_compaction = 0
+            finally:
+                portalocker.unlock(self._lock_handle)
+
+    def compact(self):
+        """Fold the journal into the snapshot; return the number of records folded."""
+        with self._cond:
+            portalocker.lock(self._lock_handle, portalocker.LOCK_EX)
+            try:
+                scheduled_posts = self._read_snapshot()
+                count = self._replay(scheduled_posts)
+                if count:
+                    self._write_snapshot_locked(scheduled_posts)
+                self._since_compaction = 0
+            finally:
+                portalocker.unlock(self._lock_handle)
+        if count:
+            logger.info(f"Compacted {count} journal records into {self.schedule_file}")
+        return count
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Error compacting {self.journal_file}: {e}")
+        finally:
+            with self._cond:
+                self._compacting = False
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import logging
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    scheduled_at TEXT,
+    posted INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_posts_due ON posts (posted, scheduled_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0), ('generation', 0);
+"""
+
+class ScheduleStore(SQLiteStore):
+    """Schedule kept in SQLite (WAL mode) instead of schedule.json.
+
+    Each post is stored as its JSON entry, with Post_ID, Posted and
+    Scheduled_DateTime mirrored into indexed columns. Scheduled_DateTime
+    uses "%Y-%m-%d %H:%M", so it sorts chronologically as text.
+
+    Every write stamps the rows it touches with the next revision, so a
+    reader can fetch just the rows changed since the revision it last saw
+    with changes_since(). replace_all() starts a new generation instead,
+    after which a reader has to load everything again.
+    """
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        with conn:
+            # Stores created before revisions were tracked get the column
+            # here; check under the write lock, as other processes may be
+            # opening the same store
+            conn.execute("BEGIN IMMEDIATE")
+            if "revision" not in [row[1] for row in conn.execute("PRAGMA table_info(posts)")]:
+                conn.execute("ALTER TABLE posts ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_revision ON posts (revision)")
+
+    @staticmethod
+    def _row(post, revision):
+        return (post["Post_ID"], post.get("Scheduled_DateTime"), 1 if post.get("Posted") else 0, json.dumps(post), revision)
+
+    @staticmethod
+    def _next_revision(conn, new_generation=False):
+        """Take the next revision inside the caller's write transaction."""
+        if new_generation:
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+    @staticmethod
+    def _cursor(conn):
+        values = dict(conn.execute("SELECT key, value FROM meta"))
+        return values["generation"], values["revision"]
+
+    def get(self, post_id):
+        """Return one post by Post_ID, or None."""
+        row = self._connection().execute("SELECT data FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load(self):
+        """Return all posts ordered by scheduled time."""
+        rows = self._connection().execute("SELECT data FROM posts ORDER BY scheduled_at")
+        return [json.loads(data) for (data,) in rows]
+
+    def load_pending(self):
+        """Return posts that have not been posted yet, ordered by scheduled time."""
+        return self.load_pending_at()[1]
+
+    def load_pending_at(self):
+        """Return ((generation, revision), pending posts) read from one snapshot."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            cursor = self._cursor(conn)
+            rows = conn.execute("SELECT data FROM posts WHERE posted = 0 ORDER BY scheduled_at")
+            return cursor, [json.loads(data) for (data,) in rows]
+
+    def changes_since(self, cursor):
+        """Return (new cursor, posts written after cursor), posted ones included.
+
+        The posts are None if replace_all() ran since cursor was taken, in
+        which case the caller has to load the schedule again.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN")
+            current = self._cursor(conn)
+            if current[0] != cursor[0]:
+                return current, None
+            rows = conn.execute("SELECT data FROM posts WHERE revision > ? ORDER BY revision", (cursor[1],))
+            return current, [json.loads(data) for (data,) in rows]
+
+    def next_due(self, limit=1):
+        """Return the earliest pending posts."""
+        rows = self._connection().execute(
+            "SELECT data FROM posts WHERE posted = 0 ORDER BY scheduled_at LIMIT ?", (limit,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def due_before(self, scheduled_datetime):
+        """Return pending posts scheduled at or before a "%Y-%m-%d %H:%M" time."""
+        rows = self._connection().execute(
+            "SELECT data FROM posts WHERE posted = 0 AND scheduled_at <= ? ORDER BY scheduled_at",
+            (scheduled_datetime,)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def upsert_many(self, posts):
+        """Insert or replace posts by Post_ID."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            revision = self._next_revision(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO posts (post_id, scheduled_at, posted, data, revision) VALUES (?, ?, ?, ?, ?)",
+                [self._row(post, revision) for post in posts]
+            )
+
+    def upsert(self, post):
+        """Insert or replace one post by Post_ID."""
+        self.upsert_many([post])
+
+    def replace_all(self, posts):
+        """Replace the whole schedule."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            revision = self._next_revision(conn, new_generation=True)
+            conn.execute("DELETE FROM posts")
+            conn.executemany(
+                "INSERT OR REPLACE INTO posts (post_id, scheduled_at, posted, data, revision) VALUES (?, ?, ?, ?, ?)",
+                [self._row(post, revision) for post in posts]
+            )
+
+    def update(self, post_id, **fields):
+        """Set fields on one post, e.g. update(post_id, Posted=True). Returns False if it does not exist."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM posts WHERE post_id = ?", (post_id,)).fetchone()
+            if not row:
+                return False
+            post = json.loads(row[0])
+            post.update(fields)
+            conn.execute(
+                "UPDATE posts SET scheduled_at = ?, posted = ?, data = ?, revision = ? WHERE post_id = ?",
+                self._row(post, self._next_revision(conn))[1:] + (post_id,)
+            )
+        return True
+
+    def data_version(self):
+        """Return a counter that changes whenever another connection commits."""
+        return self._connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def import_json(self, schedule_file):
+        """Import posts from a schedule.json file, replaying its journal if present."""
+        from schedule_journal import ScheduleJournal
+        posts = [post for post in ScheduleJournal(schedule_file).load() if post.get("Post_ID")]
+        self.upsert_many(posts)
+        logger.info(f"Imported {len(posts)} posts from {schedule_file} into {self.db_path}")
+        return len(posts)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python schedule_store.py <schedule.json> [schedule.db]")
+        sys.exit(1)
+    db_path = sys.argv[2] if len(sys.argv) == 3 else os.path.join(os.getcwd(), "schedule.db")
+    count = ScheduleStore(db_path).import_json(sys.argv[1])
+    print(f"Imported {count} posts into {db_path}")
@@ -133,139 +133,765 @@
 
 
 import os
+import sys
 import json
 import time
+import heapq
+import socket
+import struct
+from collections import deque
+import ctypes
+import ctypes.util
+import threading
 import subprocess
-import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pytz
-import portalocker
-
-# Setup logging
-log_file_path = os.path.join(os.getcwd(), "automation_log.txt")
-logging.basicConfig(
-    filename=log_file_path,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger()
+import post_to_linkedin
+from log_setup import setup_logging
+from post_claims import ClaimStore
+from shard_ring import HashRing
+from scheduler_metrics import SchedulerMetrics
 
 # Load config
 CONFIG_FILE = os.path.join(os.getcwd(), "config.json")
+config_error = None
 try:
     with open(CONFIG_FILE, "r") as f:
         config = json.load(f)
 except Exception as e:
-    logger.error(f"Error loading config.json at {CONFIG_FILE}: {e}")
+    config = {}
+    config_error = e
+
+# Setup logging; importing post_to_linkedin has usually done this already
+log_file_path = os.path.join(os.getcwd(), "automation_log.txt")
+logger = setup_logging(
+    log_file_path,
+    level=config.get("LOG_LEVEL", "DEBUG"),
+    max_bytes=config.get("LOG_MAX_BYTES", 10 * 1024 * 1024),
+    backup_count=config.get("LOG_BACKUP_COUNT", 5)
+)
+if config_error is not None:
+    logger.error(f"Error loading config.json at {CONFIG_FILE}: {config_error}")
     exit(1)
 
-def load_schedule():
-    """Load scheduled posts from schedule.json."""
-    schedule_file = os.path.join(os.getcwd(), config["SCHEDULE_FILE"])
+SCHEDULE_DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+TRIGGER_WINDOW = timedelta(minutes=1)
+
+# Fields whose change makes a published or in-flight post due again
+SCHEDULE_FIELDS = ("Scheduled_DateTime", "Output_Text", "image", "Account")
+
+# Posts found later than TRIGGER_WINDOW are still published, through the
+# rate-limited catch-up queue, until their grace period runs out
+GRACE_PERIOD_MINUTES = config.get("GRACE_PERIOD_MINUTES", 15)
+CATCHUP_RATE_PER_MINUTE = config.get("CATCHUP_RATE_PER_MINUTE", 10)
+
+# inotify event masks (see inotify(7)); IN_MODIFY is left out on purpose so
+# a half-written file is never parsed
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Set by the schedule watcher to wake the main loop early
+schedule_changed = threading.Event()
+# Set along with schedule_changed when the whole schedule has to be read
+# again rather than just the posts changed since the last read
+reload_schedule = threading.Event()
+
+# "inprocess" publishes on a warm worker pool, "subprocess" runs post_{id}.bat
+DISPATCH_MODE = config.get("DISPATCH_MODE", "inprocess")
+post_executor = ThreadPoolExecutor(max_workers=config.get("POST_WORKERS", 4), thread_name_prefix="post-worker")
+
+# Upload images this many minutes before Scheduled_DateTime; 0 disables
+PRESTAGE_MINUTES = config.get("PRESTAGE_MINUTES", 30)
+stage_executor = ThreadPoolExecutor(max_workers=config.get("STAGE_WORKERS", 2), thread_name_prefix="stage-worker")
+
+# Leases on posts, shared by every scheduler instance using the same CLAIMS_DB
+SCHEDULER_ID = config.get("SCHEDULER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+CLAIM_TTL = config.get("CLAIM_TTL", 300)
+claim_store = ClaimStore(os.path.join(os.getcwd(), config.get("CLAIMS_DB", "claims.db")))
+
+# Instances sharing CLAIMS_DB split posts between them on a consistent hash
+# ring, keyed on Post_ID or on the post's Account (SHARD_BY)
+SHARD_BY = config.get("SHARD_BY", "post")
+MEMBER_TTL = config.get("MEMBER_TTL", 15)
+shard_ring = HashRing([SCHEDULER_ID])
+
+# Post_ID -> fencing token of posts being published by this instance, so a
+# schedule reload does not re-dispatch them and their leases get renewed
+in_flight = {}
+in_flight_lock = threading.Lock()
+
+metrics = SchedulerMetrics()
+
+# Per-account admission: posts beyond an account's MAX_IN_FLIGHT wait here
+DEFAULT_ACCOUNT = "default"
+account_running = {}
+account_waiting = {}
+
+class PostQueue:
+    """Min-heap of pending posts keyed on their scheduled time."""
+
+    def __init__(self):
+        self._heap = []
+        self._scheduled = {}
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def push(self, post_id, scheduled_time):
+        """Add a post, or move it if it is already queued."""
+        self._scheduled[post_id] = scheduled_time
+        heapq.heappush(self._heap, (scheduled_time, post_id))
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            self._heap = [(t, pid) for pid, t in self._scheduled.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, post_id):
+        """Drop a post; its heap entry is discarded lazily."""
+        self._scheduled.pop(post_id, None)
+
+    def times(self):
+        """Return the scheduled times of all queued posts."""
+        return list(self._scheduled.values())
+
+    def _discard_stale(self):
+        while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def peek(self):
+        """Return (scheduled_time, post_id) of the earliest post, or None."""
+        self._discard_stale()
+        return self._heap[0] if self._heap else None
+
+    def pop(self):
+        """Remove and return (scheduled_time, post_id) of the earliest post."""
+        self._discard_stale()
+        scheduled_time, post_id = heapq.heappop(self._heap)
+        del self._scheduled[post_id]
+        return scheduled_time, post_id
+
+class CatchUpQueue(PostQueue):
+    """Overdue posts keyed on their deadline and released at a fixed rate.
+
+    A post whose lease another instance holds is deferred: it keeps its
+    place by deadline but is not released before not_before[post_id], a
+    time.time() value.
+    """
+
+    def __init__(self, rate_per_minute):
+        super().__init__()
+        self.interval = 60.0 / rate_per_minute
+        self.next_release = 0.0
+        self.not_before = {}
+
+    def defer(self, post_id, deadline, not_before):
+        """Queue a post that must not be released before not_before."""
+        self.push(post_id, deadline)
+        self.not_before[post_id] = not_before
+
+    def remove(self, post_id):
+        super().remove(post_id)
+        self.not_before.pop(post_id, None)
+
+    def pop_ready(self):
+        """Remove and return (deadline, post_id) of the earliest post that may go now, or None.
+
+        Deferred posts whose deadline has passed count as ready, so the
+        caller can drop them.
+        """
+        now = datetime.now(pytz.UTC)
+        deferred = []
+        ready = None
+        while len(self):
+            deadline, post_id = self.pop()
+            if self.not_before.get(post_id, 0) > time.time() and deadline > now:
+                deferred.append((deadline, post_id))
+                continue
+            ready = deadline, post_id
+            break
+        for deadline, post_id in deferred:
+            self.push(post_id, deadline)
+        return ready
+
+    def seconds_until_release(self):
+        """Seconds until the next post may be released."""
+        wait = self.next_release - time.monotonic()
+        if self.not_before and len(self.not_before) >= len(self):
+            # Every queued post is deferred
+            wait = max(wait, min(self.not_before.values()) - time.time())
+        return max(wait, 0)
+
+    def record_release(self):
+        self.next_release = time.monotonic() + self.interval
+
+def get_schedule_file():
+    """Return the absolute path of the schedule file or database."""
+    return post_to_linkedin.get_schedule_location()
+
+def load_schedule(cursor=None):
+    """Load scheduled posts; returns (cursor, posts, complete).
+
+    With the SQLite backend, passing the cursor from the previous call
+    reads only the posts written since then, posted ones included, and
+    complete is False. Without a cursor, or once the store was replaced,
+    all pending posts are read and complete is True. posts is None if the
+    schedule exists but cannot be read, so the caller can keep its
+    previous copy of the schedule.
+    """
+    schedule_file = get_schedule_file()
     try:
-        if os.path.exists(schedule_file):
-            with open(schedule_file, "r") as f:
-                return json.load(f)
-        logger.warning(f"{schedule_file} not found.")
-        return []
+        store = post_to_linkedin.schedule_store
+        if store:
+            if cursor is not None:
+                new_cursor, changes = store.changes_since(cursor)
+                if changes is not None:
+                    return new_cursor, changes, False
+            cursor, posts = store.load_pending_at()
+            return cursor, posts, True
+        return None, post_to_linkedin.schedule_journal.load(), True
     except Exception as e:
-        logger.error(f"Error loading schedule.json at {schedule_file}: {e}")
-        return []
+        logger.error(f"Error loading schedule at {schedule_file}: {e}")
+        return cursor, None, True
 
 def save_schedule(scheduled_posts):
-    """Save scheduled posts to schedule.json with file locking."""
-    schedule_file = os.path.join(os.getcwd(), config["SCHEDULE_FILE"])
+    """Save scheduled posts to schedule.json, folding in the journal."""
+    post_to_linkedin.save_schedule(scheduled_posts)
+
+def claim_post(post_id):
+    """Take the lease on a post; returns its fencing token or None if another instance holds it."""
     try:
-        with open(schedule_file, "w") as f:
-            json.dump(scheduled_posts, f, indent=2)
-        logger.info(f"Saved {len(scheduled_posts)} scheduled posts to {schedule_file}")
+        return claim_store.claim(post_id, SCHEDULER_ID, CLAIM_TTL)
     except Exception as e:
-        logger.error(f"Error saving schedule.json at {schedule_file}: {e}")
-
-def is_post_locked(post_id):
-    """Check if a post is locked using a file-based lock."""
-    lock_file = os.path.join(os.getcwd(), f"lock_{post_id}.txt")
-    return os.path.exists(lock_file)
+        logger.error(f"Error claiming post {post_id}: {e}")
+        return None
 
-def lock_post(post_id):
-    """Create a lock file for the post."""
-    lock_file = os.path.join(os.getcwd(), f"lock_{post_id}.txt")
+def release_post(post_id, token):
+    """Release the lease on a post."""
     try:
-        with portalocker.Lock(lock_file, 'w', timeout=1) as f:
-            return True
-    except portalocker.LockException:
-        logger.warning(f"Post {post_id} is already locked, skipping")
-        return False
+        claim_store.release(post_id, SCHEDULER_ID, token)
+        logger.info(f"Released claim on post {post_id}")
     except Exception as e:
-        logger.error(f"Error locking post {post_id}: {e}")
-        return False
+        logger.error(f"Error releasing claim on post {post_id}: {e}")
 
-def unlock_post(post_id):
-    """Remove the lock file for the post."""
-    lock_file = os.path.join(os.getcwd(), f"lock_{post_id}.txt")
+def holds_claim(post_id, token):
+    """Fencing check: True while this instance still holds the lease it was given."""
     try:
-        if os.path.exists(lock_file):
-            os.remove(lock_file)
-            logger.info(f"Unlocked post {post_id}")
+        return claim_store.is_held(post_id, SCHEDULER_ID, token)
     except Exception as e:
-        logger.error(f"Error unlocking post {post_id}: {e}")
+        logger.error(f"Error checking claim on post {post_id}: {e}")
+        return False
+
+def renew_claims(interval):
+    """Keep the leases of in-flight posts alive while they wait or publish."""
+    while True:
+        time.sleep(interval)
+        with in_flight_lock:
+            held = list(in_flight.items())
+        for post_id, token in held:
+            try:
+                if not claim_store.renew(post_id, SCHEDULER_ID, token, CLAIM_TTL):
+                    logger.warning(f"Lost claim on post {post_id} (token {token})")
+            except Exception as e:
+                logger.error(f"Error renewing claim on post {post_id}: {e}")
 
 def run_batch_file(post_id):
-    """Run the corresponding batch file for a post with locking."""
+    """Run the corresponding batch file for a post."""
     batch_file = os.path.join(os.getcwd(), f"post_{post_id}.bat")
     if os.path.exists(batch_file):
-        if lock_post(post_id):
-            try:
-                logger.info(f"Executing batch file {batch_file} for Post_ID: {post_id}")
-                result = subprocess.run(batch_file, shell=True, capture_output=True, text=True)
-                if result.returncode == 0:
-                    logger.info(f"Successfully executed batch file for Post_ID: {post_id}")
-                    return True
-                else:
-                    logger.error(f"Batch file failed for Post_ID {post_id}, Return code: {result.returncode}, Output: {result.stdout}, Error: {result.stderr}")
-                    return False
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Error executing batch file for Post_ID {post_id}: {e}")
+        try:
+            logger.info(f"Executing batch file {batch_file} for Post_ID: {post_id}")
+            result = subprocess.run(batch_file, shell=True, capture_output=True, text=True)
+            if result.returncode == 0:
+                logger.info(f"Successfully executed batch file for Post_ID: {post_id}")
+                return True
+            else:
+                logger.error(f"Batch file failed for Post_ID {post_id}, Return code: {result.returncode}, Output: {result.stdout}, Error: {result.stderr}")
                 return False
-            except Exception as e:
-                logger.error(f"Unexpected error running batch file for Post_ID {post_id}: {e}")
-                return False
-            finally:
-                unlock_post(post_id)
-        else:
-            logger.warning(f"Post {post_id} is already locked, skipping execution")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error executing batch file for Post_ID {post_id}: {e}")
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error running batch file for Post_ID {post_id}: {e}")
             return False
     else:
         logger.error(f"Batch file {batch_file} not found for Post_ID: {post_id}")
         return False
 
-def main():
-    """Main loop to monitor and execute scheduled posts at exact times."""
-    logger.info("Scheduler started, monitoring schedule.json...")
+def run_post_inprocess(post_id, token):
+    """Publish a post through post_to_linkedin in this process."""
+    try:
+        logger.info(f"Publishing Post_ID: {post_id} in-process (claim token {token})")
+        return post_to_linkedin.publish_post(post_id, fence=lambda: holds_claim(post_id, token))
+    except Exception as e:
+        logger.error(f"Unexpected error publishing Post_ID {post_id}: {e}")
+        return False
+
+def run_post(post_id, token):
+    """Publish a claimed post using the configured dispatch mode."""
+    if not holds_claim(post_id, token):
+        logger.warning(f"Claim on post {post_id} expired before it started, skipping execution")
+        return False
+    if DISPATCH_MODE == "subprocess":
+        if run_batch_file(post_id):
+            post_to_linkedin.mark_posted(post_id)
+            return True
+        return False
+    return run_post_inprocess(post_id, token)
+
+def timed_run_post(post_id, token):
+    """Run a post and record how long it took."""
+    started = time.monotonic()
+    try:
+        return run_post(post_id, token)
+    finally:
+        metrics.observe_execution(time.monotonic() - started)
+
+def get_account_limit(account):
+    """Return how many posts of an account may be published at once."""
+    account_config = post_to_linkedin.get_account_config(account)
+    return account_config.get("MAX_IN_FLIGHT", config.get("MAX_IN_FLIGHT_PER_ACCOUNT", 2))
+
+def start_post(post_id, post, token):
+    """Submit a post to the worker pool; its account slot is already taken."""
+    future = post_executor.submit(timed_run_post, post_id, token)
+    future.add_done_callback(lambda f: finish_post(post_id, post, token, f))
+
+def finish_post(post_id, post, token, future):
+    """Worker pool callback: record the outcome and admit the next waiting post."""
+    try:
+        success = future.result()
+    except Exception as e:
+        logger.error(f"Unexpected error running Post_ID {post_id}: {e}")
+        success = False
+    if success:
+        post["Posted"] = True
+        lag = (datetime.now(pytz.UTC) - parse_scheduled_time(post)).total_seconds()
+        metrics.observe_lag(lag)
+        metrics.increment("published")
+        logger.info(f"Successfully posted Post_ID: {post_id}, {lag:.1f}s after its scheduled time")
+    else:
+        metrics.increment("failed")
+        logger.error(f"Failed to post Post_ID: {post_id} after execution")
+    account = post.get("Account") or DEFAULT_ACCOUNT
+    next_post = None
+    release_post(post_id, token)
+    with in_flight_lock:
+        in_flight.pop(post_id, None)
+        waiting = account_waiting.get(account)
+        if waiting:
+            next_post = waiting.popleft()
+        else:
+            account_running[account] -= 1
+    if next_post:
+        start_post(*next_post)
+
+def submit_post(post_id, post, token):
+    """Hand a claimed post to the worker pool, or queue it behind its account's limit."""
+    account = post.get("Account") or DEFAULT_ACCOUNT
+    with in_flight_lock:
+        in_flight[post_id] = token
+        if account_running.get(account, 0) >= get_account_limit(account):
+            account_waiting.setdefault(account, deque()).append((post_id, post, token))
+            logger.info(f"Account {account} at its in-flight limit, Post_ID {post_id} queued")
+            return
+        account_running[account] = account_running.get(account, 0) + 1
+    start_post(post_id, post, token)
+
+def parse_scheduled_time(post):
+    """Parse a post's Scheduled_DateTime into an aware UTC datetime."""
+    return datetime.strptime(post["Scheduled_DateTime"], SCHEDULE_DATETIME_FORMAT).replace(tzinfo=pytz.UTC)
+
+def get_shard_key(post):
+    """Return the key a post is placed on the shard ring by."""
+    if SHARD_BY == "account":
+        return post.get("Account") or DEFAULT_ACCOUNT
+    return post["Post_ID"]
+
+def owns_post(post):
+    """Return True if this instance's partition contains the post."""
+    return shard_ring.owner(get_shard_key(post)) == SCHEDULER_ID
+
+def refresh_membership():
+    """Heartbeat into the claim store and rebuild the ring if members joined or left."""
+    global shard_ring
+    try:
+        claim_store.heartbeat(SCHEDULER_ID, MEMBER_TTL)
+        members = claim_store.live_members()
+        if SCHEDULER_ID not in members:
+            members.append(SCHEDULER_ID)
+        if tuple(sorted(members)) != shard_ring.members:
+            shard_ring = HashRing(members)
+            logger.info(f"Shard membership changed, now {len(members)} instances: {', '.join(shard_ring.members)}")
+            # Re-read the schedule to pick up or drop reassigned posts
+            reload_schedule.set()
+            schedule_changed.set()
+    except Exception as e:
+        logger.error(f"Error updating shard membership: {e}")
+
+def update_membership(heartbeat_interval):
+    """Call refresh_membership every heartbeat_interval seconds."""
+    while True:
+        time.sleep(heartbeat_interval)
+        refresh_membership()
+
+def needs_staging(post):
+    """Return True if a post has an image that has not been uploaded ahead of time."""
+    image_url = post.get("image")
+    return bool(image_url) and not (post.get("Asset_URN") and post.get("Asset_Image") == image_url)
+
+def is_stale_copy(post_id, previous, post):
+    """True if post was read before this instance recorded the publish of previous.
+
+    Such a copy still says Posted: False although the post is published or
+    being published; only a change to its SCHEDULE_FIELDS queues it again.
+    """
+    if post.get("Posted") or any(previous.get(field) != post.get(field) for field in SCHEDULE_FIELDS):
+        return False
+    if previous.get("Posted"):
+        return True
+    with in_flight_lock:
+        return post_id in in_flight
+
+def apply_schedule_changes(queue, known_posts, scheduled_posts, owns=None, catchup=None, staging=None,
+                           complete=True):
+    """Apply added, modified and removed schedule entries to the queue.
+
+    known_posts maps Post_ID to the entry last applied and is updated in
+    place. Only entries that differ from it are parsed again, and stale
+    copies of published or in-flight posts are ignored. Entries for
+    which owns(post) is False are treated as absent. Changed entries are
+    also dropped from the catch-up queue, if one is given, and queued
+    again in staging, keyed on their pre-staging time, while their image
+    still needs uploading. If complete is False, scheduled_posts holds
+    only the entries changed since the last call: entries missing from it
+    are kept, and posted ones are removed. Returns the number of (added,
+    modified, removed) entries.
+    """
+    def remove(post_id):
+        del known_posts[post_id]
+        queue.remove(post_id)
+        if catchup is not None:
+            catchup.remove(post_id)
+        if staging is not None:
+            staging.remove(post_id)
+
+    added = modified = removed = 0
+    seen = set()
+    for post in scheduled_posts:
+        post_id = post.get("Post_ID")
+        if post_id is None:
+            continue
+        if not complete and ((owns and not owns(post)) or post.get("Posted")):
+            if post_id in known_posts:
+                remove(post_id)
+                removed += 1
+            continue
+        if owns and not owns(post):
+            continue
+        seen.add(post_id)
+        previous = known_posts.get(post_id)
+        if previous == post or (previous is not None and is_stale_copy(post_id, previous, post)):
+            continue
+        known_posts[post_id] = post
+        if catchup is not None:
+            catchup.remove(post_id)
+        if staging is not None:
+            staging.remove(post_id)
+        if previous is None:
+            added += 1
+        else:
+            modified += 1
+        if post.get("Posted"):
+            queue.remove(post_id)
+            continue
+        try:
+            scheduled_time = parse_scheduled_time(post)
+            queue.push(post_id, scheduled_time)
+            if staging is not None and needs_staging(post):
+                staging.push(post_id, scheduled_time - timedelta(minutes=PRESTAGE_MINUTES))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Skipping invalid schedule entry {post_id}: {e}")
+            queue.remove(post_id)
+    if complete:
+        for post_id in [post_id for post_id in known_posts if post_id not in seen]:
+            remove(post_id)
+            removed += 1
+    return added, modified, removed
+
+def schedule_signature(schedule_file):
+    """Return (mtime_ns, size) of the schedule file, or None if it is missing."""
+    try:
+        st = os.stat(schedule_file)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+def open_inotify(schedule_file):
+    """Return an inotify descriptor watching the schedule's directory, or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        # Watch the directory so atomic replace-by-rename is also seen
+        mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(fd, os.path.dirname(schedule_file).encode(), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError) as e:
+        logger.warning(f"inotify unavailable, falling back to polling: {e}")
+        return None
+
+def watch_schedule_inotify(fd, schedule_file):
+    """Set schedule_changed on inotify events for the schedule file."""
+    name = os.path.basename(schedule_file).encode()
+    while True:
+        buffer = os.read(fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            event_name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if event_name == name:
+                logger.debug(f"Detected change in {schedule_file}")
+                schedule_changed.set()
+
+def watch_schedule(schedule_file, poll_interval):
+    """Set schedule_changed whenever the schedule file is modified.
+
+    Uses inotify on Linux and falls back to polling mtime and size.
+    """
+    fd = open_inotify(schedule_file)
+    if fd is not None:
+        logger.info(f"Watching {schedule_file} with inotify")
+        try:
+            watch_schedule_inotify(fd, schedule_file)
+        except OSError as e:
+            logger.warning(f"inotify watch failed, falling back to polling: {e}")
+        finally:
+            os.close(fd)
+    logger.info(f"Polling {schedule_file} every {poll_interval}s")
+    last_signature = schedule_signature(schedule_file)
+    while True:
+        time.sleep(poll_interval)
+        signature = schedule_signature(schedule_file)
+        if signature != last_signature:
+            last_signature = signature
+            logger.debug(f"Detected change in {schedule_file}")
+            schedule_changed.set()
+
+def watch_schedule_store(store, poll_interval):
+    """Set schedule_changed whenever another connection commits to the SQLite store."""
+    logger.info(f"Polling {store.db_path} data_version every {poll_interval}s")
+    last_version = store.data_version()
+    while True:
+        time.sleep(poll_interval)
+        version = store.data_version()
+        if version != last_version:
+            last_version = version
+            logger.debug(f"Detected change in {store.db_path}")
+            schedule_changed.set()
+
+def get_deadline(post, scheduled_time):
+    """Return the latest time a post may still be published."""
+    grace = timedelta(minutes=post.get("Grace_Minutes", GRACE_PERIOD_MINUTES))
+    return scheduled_time + max(grace, TRIGGER_WINDOW)
+
+def lease_expiry(post_id):
+    """Return when another instance's lease on a post runs out, or None if it has none."""
+    try:
+        return claim_store.lease_expiry(post_id)
+    except Exception as e:
+        logger.error(f"Error reading claim on post {post_id}: {e}")
+        return None
+
+def is_posted(post_id):
+    """Return True if the schedule records the post as published."""
+    post = post_to_linkedin.get_scheduled_post(post_id)
+    return bool(post and post.get("Posted"))
+
+def dispatch_post(post_id, post, catchup, deadline):
+    """Claim a post and hand it to the worker pool; returns False if another scheduler has it.
+
+    A post claimed elsewhere is deferred in the catch-up queue until that
+    lease expires, in case its holder died before publishing it.
+    """
+    token = claim_post(post_id)
+    if token is None:
+        # The lease may have just lapsed, or the claim store may be unreachable
+        retry_at = lease_expiry(post_id) or time.time() + 1
+        logger.warning(f"Post {post_id} is claimed by another scheduler, retrying in {max(retry_at - time.time(), 0):.0f}s")
+        catchup.defer(post_id, deadline, retry_at)
+        return False
+    submit_post(post_id, post, token)
+    return True
+
+def drain_catchup(catchup, posts_by_id):
+    """Release overdue posts in earliest-deadline order, at most one per catch-up interval."""
+    while len(catchup) and catchup.seconds_until_release() == 0:
+        ready = catchup.pop_ready()
+        if ready is None:
+            break
+        deadline, post_id = ready
+        was_deferred = catchup.not_before.pop(post_id, None) is not None
+        with in_flight_lock:
+            if post_id in in_flight:
+                continue
+        if datetime.now(pytz.UTC) >= deadline:
+            metrics.increment("missed")
+            logger.warning(f"Grace period expired for Post_ID: {post_id} (deadline {deadline})")
+            continue
+        if was_deferred and is_posted(post_id):
+            logger.info(f"Post_ID: {post_id} was published by the scheduler that held it")
+            continue
+        logger.info(f"Catching up overdue Post_ID: {post_id} (deadline {deadline}, {len(catchup)} still overdue)")
+        if dispatch_post(post_id, posts_by_id[post_id], catchup, deadline):
+            metrics.increment("caught_up")
+            catchup.record_release()
+
+def dispatch_due_posts(queue, catchup, posts_by_id):
+    """Submit every post whose scheduled time has been reached.
+
+    Posts still inside TRIGGER_WINDOW go out immediately. Later ones move
+    to the catch-up queue until their deadline. Returns the number of
+    seconds until there is more work, or None if both queues are empty.
+    """
     while True:
-        scheduled_posts = load_schedule()
         now = datetime.now(pytz.UTC)
-        
-        for post in scheduled_posts:
-            post_id = post["Post_ID"]
-            if not post.get("Posted") and not is_post_locked(post_id):
-                scheduled_time = datetime.strptime(post["Scheduled_DateTime"], "%Y-%m-%d %H:%M").replace(tzinfo=pytz.UTC)
-                if now >= scheduled_time and now < scheduled_time + timedelta(minutes=1):  # Trigger within 1-minute window
-                    logger.info(f"Scheduled time reached for Post_ID: {post_id} at {scheduled_time}")
-                    if run_batch_file(post_id):
-                        post["Posted"] = True
-                        save_schedule(scheduled_posts)
-                    else:
-                        logger.error(f"Failed to post Post_ID: {post_id} after execution")
-                elif now < scheduled_time:
-                    # Calculate time until next check (e.g., check 5 minutes before scheduled time)
-                    time_to_wait = (scheduled_time - now).total_seconds() - 300  # 5 minutes early
-                    if time_to_wait > 0:
-                        time.sleep(min(time_to_wait, 60))  # Wait but cap at 60 seconds
-                    else:
-                        time.sleep(60)  # Default check interval
-        
-        time.sleep(60)  # Default check every minute if no future posts are close
+        head = queue.peek()
+        if head is None or head[0] > now:
+            break
+        scheduled_time, post_id = queue.pop()
+        with in_flight_lock:
+            if post_id in in_flight:
+                continue
+        post = posts_by_id[post_id]
+        deadline = get_deadline(post, scheduled_time)
+        if now < scheduled_time + TRIGGER_WINDOW:
+            logger.info(f"Scheduled time reached for Post_ID: {post_id} at {scheduled_time}")
+            dispatch_post(post_id, post, catchup, deadline)
+            continue
+        if now >= deadline:
+            metrics.increment("missed")
+            logger.warning(f"Missed Post_ID: {post_id} scheduled at {scheduled_time}, grace period ended at {deadline}")
+            continue
+        logger.warning(f"Post_ID: {post_id} scheduled at {scheduled_time} is overdue, queued for catch-up")
+        catchup.push(post_id, deadline)
+    drain_catchup(catchup, posts_by_id)
+    waits = []
+    head = queue.peek()
+    if head is not None:
+        waits.append((head[0] - datetime.now(pytz.UTC)).total_seconds())
+    if len(catchup):
+        waits.append(catchup.seconds_until_release())
+    return max(min(waits), 0) if waits else None
+
+def stage_due_media(staging, posts_by_id):
+    """Start image uploads for posts whose pre-staging time has been reached.
+
+    Posts that are already due are left to publish_post. Returns the number
+    of seconds until the next upload, or None if none are queued.
+    """
+    now = datetime.now(pytz.UTC)
+    while True:
+        head = staging.peek()
+        if head is None or head[0] > now:
+            break
+        _, post_id = staging.pop()
+        post = posts_by_id.get(post_id)
+        if post is None or parse_scheduled_time(post) <= now:
+            continue
+        logger.info(f"Pre-staging image for Post_ID: {post_id}")
+        stage_executor.submit(post_to_linkedin.stage_media, post_id)
+    head = staging.peek()
+    return None if head is None else max((head[0] - now).total_seconds(), 0)
+
+def main():
+    """Main loop: sleep until the next post is due or the schedule changes."""
+    logger.info(f"Scheduler {SCHEDULER_ID} started in {DISPATCH_MODE} mode, monitoring schedule.json...")
+    try:
+        purged = claim_store.purge_expired()
+        if purged:
+            logger.info(f"Purged {purged} expired claims from {claim_store.db_path}")
+    except Exception as e:
+        logger.error(f"Error purging expired claims: {e}")
+    threading.Thread(target=renew_claims, args=(max(CLAIM_TTL / 3, 1),), daemon=True).start()
+    # Join the ring before the first load, so it only queues this instance's share
+    refresh_membership()
+    threading.Thread(target=update_membership, args=(max(MEMBER_TTL / 3, 1),), daemon=True).start()
+    poll_interval = config.get("SCHEDULE_POLL_INTERVAL", 1)
+    if post_to_linkedin.schedule_store:
+        watcher = threading.Thread(
+            target=watch_schedule_store,
+            args=(post_to_linkedin.schedule_store, poll_interval),
+            daemon=True
+        )
+    else:
+        try:
+            post_to_linkedin.schedule_journal.compact()
+        except Exception as e:
+            logger.error(f"Error compacting schedule journal at startup: {e}")
+        watcher = threading.Thread(
+            target=watch_schedule,
+            args=(get_schedule_file(), poll_interval),
+            daemon=True
+        )
+    watcher.start()
+    if DISPATCH_MODE == "inprocess":
+        post_to_linkedin.workbook_sink.start()
+    queue = PostQueue()
+    catchup = CatchUpQueue(CATCHUP_RATE_PER_MINUTE)
+    staging = PostQueue() if PRESTAGE_MINUTES > 0 else None
+    known_posts = {}
+    schedule_cursor = None
+    metrics.set_queue_source(queue.times, lambda: len(catchup))
+    if config.get("METRICS_PORT", 9108):
+        try:
+            metrics.start_http_server(config.get("METRICS_PORT", 9108))
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint: {e}")
+    if config.get("METRICS_SNAPSHOT_FILE", "scheduler_metrics.json"):
+        metrics.start_snapshot_writer(
+            os.path.join(os.getcwd(), config.get("METRICS_SNAPSHOT_FILE", "scheduler_metrics.json")),
+            config.get("METRICS_SNAPSHOT_INTERVAL", 30)
+        )
+    schedule_changed.set()
+    try:
+        while True:
+            tick_started = time.monotonic()
+            if schedule_changed.is_set():
+                schedule_changed.clear()
+                if reload_schedule.is_set():
+                    reload_schedule.clear()
+                    schedule_cursor = None
+                schedule_cursor, scheduled_posts, complete = load_schedule(schedule_cursor)
+                if scheduled_posts is None:
+                    logger.warning("Keeping previous schedule until it can be read again")
+                else:
+                    added, modified, removed = apply_schedule_changes(queue, known_posts, scheduled_posts, owns_post, catchup, staging,
+                                                                      complete)
+                    if added or modified or removed:
+                        logger.info(f"Schedule reloaded: {added} added, {modified} modified, {removed} removed, {len(queue)} pending in this partition")
+            time_to_wait = dispatch_due_posts(queue, catchup, known_posts)
+            if staging is not None:
+                waits = [w for w in (time_to_wait, stage_due_media(staging, known_posts)) if w is not None]
+                time_to_wait = min(waits) if waits else None
+            metrics.observe_tick(time.monotonic() - tick_started)
+            schedule_changed.wait(time_to_wait)
+    finally:
+        # Hand this instance's share to the others right away
+        try:
+            claim_store.leave(SCHEDULER_ID)
+        except Exception as e:
+            logger.error(f"Error leaving shard membership: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytz
+
+logger = logging.getLogger()
+
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300)
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUEUE_HORIZONS = (("overdue", timedelta(0)), ("1m", timedelta(minutes=1)), ("5m", timedelta(minutes=5)),
+                  ("1h", timedelta(hours=1)), ("24h", timedelta(hours=24)))
+
+class Histogram:
+    """Cumulative histogram in the Prometheus bucket layout."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def snapshot(self):
+        return {
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            "count": self.count,
+            "sum": self.sum
+        }
+
+class SchedulerMetrics:
+    """Dispatch lag, missed posts, queue depth, execution and tick timings for the scheduler."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lag = Histogram("scheduler_publish_lag_seconds", "Actual publish time minus Scheduled_DateTime.", LAG_BUCKETS)
+        self.execution = Histogram("scheduler_post_execution_seconds", "Time spent publishing one post.", DURATION_BUCKETS)
+        self.tick = Histogram("scheduler_tick_duration_seconds", "Time spent reloading and dispatching per loop iteration.", DURATION_BUCKETS)
+        self.counters = {"published": 0, "failed": 0, "missed": 0, "caught_up": 0}
+        self._queue_times = lambda: []
+        self._catchup_depth = lambda: 0
+
+    def set_queue_source(self, queue_times, catchup_depth=None):
+        """Register callables returning the scheduled times of queued posts and the catch-up queue length."""
+        self._queue_times = queue_times
+        if catchup_depth is not None:
+            self._catchup_depth = catchup_depth
+
+    def observe_lag(self, seconds):
+        with self._lock:
+            self.lag.observe(seconds)
+
+    def observe_execution(self, seconds):
+        with self._lock:
+            self.execution.observe(seconds)
+
+    def observe_tick(self, seconds):
+        with self._lock:
+            self.tick.observe(seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def queue_depth(self):
+        """Count queued posts due within each horizon, plus the total."""
+        now = datetime.now(pytz.UTC)
+        times = self._queue_times()
+        depth = {label: sum(1 for t in times if t <= now + horizon) for label, horizon in QUEUE_HORIZONS}
+        depth["all"] = len(times)
+        return depth
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        depth = self.queue_depth()
+        with self._lock:
+            lines = []
+            for histogram in (self.lag, self.execution, self.tick):
+                lines.extend(histogram.render())
+            for name, value in self.counters.items():
+                lines.append(f"# HELP scheduler_posts_{name}_total Posts {name}.")
+                lines.append(f"# TYPE scheduler_posts_{name}_total counter")
+                lines.append(f"scheduler_posts_{name}_total {value}")
+        lines.append("# HELP scheduler_queue_depth Queued posts due within a time horizon.")
+        lines.append("# TYPE scheduler_queue_depth gauge")
+        for label, value in depth.items():
+            lines.append(f'scheduler_queue_depth{{horizon="{label}"}} {value}')
+        lines.append("# HELP scheduler_catchup_depth Overdue posts waiting in the catch-up queue.")
+        lines.append("# TYPE scheduler_catchup_depth gauge")
+        lines.append(f"scheduler_catchup_depth {self._catchup_depth()}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serializable dict."""
+        depth = self.queue_depth()
+        with self._lock:
+            return {
+                "timestamp": datetime.now(pytz.UTC).isoformat(),
+                "publish_lag_seconds": self.lag.snapshot(),
+                "post_execution_seconds": self.execution.snapshot(),
+                "tick_duration_seconds": self.tick.snapshot(),
+                "posts": dict(self.counters),
+                "queue_depth": depth,
+                "catchup_depth": self._catchup_depth()
+            }
+
+    def write_snapshot(self, path):
+        """Atomically write snapshot() to a JSON file."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_snapshot_writer(self, path, interval):
+        """Write a JSON snapshot every interval seconds in a background thread."""
+        def write_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write_snapshot(path)
+                except Exception as e:
+                    logger.error(f"Error writing metrics snapshot to {path}: {e}")
+        threading.Thread(target=write_loop, name="metrics-snapshot", daemon=True).start()
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serve render_prometheus() at http://host:port/metrics in a background thread."""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving scheduler metrics at http://{host}:{port}/metrics")
+        return server
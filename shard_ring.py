@@ -0,0 +1,30 @@
+import bisect
+import hashlib
+
+def ring_hash(key):
+    """Map a string to a position on the ring."""
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+
+    When a member joins or leaves, only the keys on the arcs it gains or
+    loses change owner.
+    """
+
+    def __init__(self, members, replicas=64):
+        self.members = tuple(sorted(members))
+        points = sorted(
+            (ring_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        """Return the member that owns key, or None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._owners[index]
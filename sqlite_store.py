@@ -0,0 +1,24 @@
+import sqlite3
+import threading
+
+class SQLiteStore:
+    """Base for the stores kept in one SQLite file shared between processes.
+
+    Each thread gets its own connection in autocommit mode, so writers take
+    their locks explicitly with BEGIN IMMEDIATE. WAL lets readers carry on
+    while another process writes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
@@ -1289,33 +1289,80 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import uuid
+from collections import deque
 from datetime import datetime, timedelta
 import pytz
 import dropbox
+from schedule_store import ScheduleStore
+from log_setup import setup_logging, LOG_FORMAT
+
+# In-app log storage
+LOG_RECORDER_CAPACITY = 2000
+LOG_VIEW_LINES = 500
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+class LogRecorder(logging.Handler):
+    """Keeps the most recent log lines for the View Log expander.
+
+    Lines are formatted once and kept in a deque of at most capacity
+    entries, so memory stays flat however long the session runs. The app
+    logs on the root logger; other loggers (urllib3, groq, dropbox, ...)
+    are only kept from library_level up.
+    """
+
+    def __init__(self, capacity=LOG_RECORDER_CAPACITY, library_level=logging.WARNING):
+        super().__init__()
+        self.library_level = library_level
+        self.entries = deque(maxlen=capacity)
+        self.logger_names = set()
+        self.seq = 0
 
-# Custom log storage
-log_records = []
+    def emit(self, record):
+        if record.name != "root" and record.levelno < self.library_level:
+            return
+        self.seq += 1
+        self.logger_names.add(record.name)
+        self.entries.append((self.seq, record.levelno, record.name, self.format(record)))
+
+    def lines_after(self, seq, min_level=logging.DEBUG, logger_names=()):
+        """Return (latest seq, lines recorded after seq at min_level or above from logger_names, or any logger)."""
+        lines = []
+        with self.lock:
+            latest = self.seq
+            for entry_seq, levelno, name, line in reversed(self.entries):
+                if entry_seq <= seq:
+                    break
+                if levelno >= min_level and (not logger_names or name in logger_names):
+                    lines.append(line)
+        lines.reverse()
+        return latest, lines
+
+@st.cache_resource
+def get_log_recorder():
+    """Set up queued logging to stderr and the in-app recorder once per server process."""
+    recorder = LogRecorder()
+    recorder.setFormatter(logging.Formatter(LOG_FORMAT))
+    setup_logging(stream=True, handlers=(recorder,))
+    return recorder
 
 # Setup logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+recorder = get_log_recorder()
 logger = logging.getLogger()
-handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
-class LogRecorder:
-    def __init__(self):
-        self.records = []
-
-    def emit(self, record):
-        self.records.append(record)
-
-recorder = LogRecorder()
-recorder_handler = logging.StreamHandler()
-recorder_handler.setFormatter(formatter)
-recorder_handler.emit = recorder.emit
-logger.addHandler(recorder_handler)
+def render_log_view(min_level, logger_names):
+    """Return the last LOG_VIEW_LINES matching log lines for this session.
+
+    The lines shown on the previous rerun are kept in session state, so
+    only lines recorded since then are fetched and formatted into the view.
+    """
+    view = st.session_state.get("log_view")
+    filters = (min_level, tuple(logger_names))
+    if view is None or view["filters"] != filters:
+        view = {"filters": filters, "seq": 0, "lines": deque(maxlen=LOG_VIEW_LINES)}
+        st.session_state.log_view = view
+    view["seq"], lines = recorder.lines_after(view["seq"], min_level, set(logger_names))
+    view["lines"].extend(lines)
+    return "\n".join(view["lines"])
 
 # Configuration
 DEFAULT_CONFIG = {
@@ -1324,6 +1371,8 @@ DEFAULT_CONFIG = {
     "NUM_VARIATIONS": 3,
     "LINKEDIN_RETRIES": 3,
     "LINKEDIN_RETRY_DELAY": 2,
+    # Seconds to wait between Groq requests in process_rows
+    "GROQ_REQUEST_DELAY": 1,
 }
 
 config = DEFAULT_CONFIG.copy()
@@ -1334,6 +1383,12 @@ if hasattr(st, 'secrets') and st.secrets is not None:
         config["LINKEDIN_ACCESS_TOKEN"] = st.secrets["LINKEDIN_ACCESS_TOKEN"]
     if "DROPBOX_ACCESS_TOKEN" in st.secrets:
         config["DROPBOX_ACCESS_TOKEN"] = st.secrets["DROPBOX_ACCESS_TOKEN"]
+    if "SCHEDULE_BACKEND" in st.secrets:
+        config["SCHEDULE_BACKEND"] = st.secrets["SCHEDULE_BACKEND"]
+    if "SCHEDULE_DB" in st.secrets:
+        config["SCHEDULE_DB"] = st.secrets["SCHEDULE_DB"]
+    if "GROQ_REQUEST_DELAY" in st.secrets:
+        config["GROQ_REQUEST_DELAY"] = st.secrets["GROQ_REQUEST_DELAY"]
 else:
     st.error("Streamlit secrets are not available.")
     logger.error("st.secrets is not available.")
@@ -1342,10 +1397,28 @@ else:
 # Initialize Dropbox client
 dbx = dropbox.Dropbox(config["DROPBOX_ACCESS_TOKEN"])
 
+@st.cache_resource
+def get_schedule_store(db_path):
+    return ScheduleStore(db_path)
+
+# Local SQLite schedule shared with scheduler.py and post_to_linkedin.py
+schedule_store = None
+if config.get("SCHEDULE_BACKEND") == "sqlite":
+    schedule_store = get_schedule_store(config.get("SCHEDULE_DB", "schedule.db"))
+
 def save_scheduled_post(post_data):
     json_data = json.dumps(post_data)
     dbx.files_upload(json_data.encode("utf-8"), "/scheduled_posts.json", mode=dropbox.files.WriteMode("overwrite"))
     logger.info(f"Saved scheduled post to Dropbox: {post_data['Post_ID']}")
+    if schedule_store:
+        schedule_store.upsert({
+            "Post_ID": post_data["Post_ID"],
+            "Output_Text": post_data["Text"],
+            "image": post_data.get("Image"),
+            "Scheduled_DateTime": post_data["Scheduled_DateTime"],
+            "Posted": post_data["Posted"]
+        })
+        logger.info(f"Saved scheduled post to {schedule_store.db_path}: {post_data['Post_ID']}")
 
 def load_scheduled_posts():
     try:
@@ -1462,7 +1535,7 @@ def process_rows(df, process_type, num_variations):
                 post_index += 1
             else:
                 status_text.warning(f"Failed to enhance content at row {idx+1}.")
-            time.sleep(1)
+            time.sleep(config["GROQ_REQUEST_DELAY"])
         
         elif input_type == "prompt":
             status_text.info(f"Generating posts for prompt (Row {idx+1}): {input_text[:50]}...")
@@ -1485,7 +1558,7 @@ def process_rows(df, process_type, num_variations):
                     post_index += 1
                 else:
                     status_text.warning(f"Failed to generate variation {variation} for prompt at row {idx+1}.")
-                time.sleep(1)
+                time.sleep(config["GROQ_REQUEST_DELAY"])
         
         if total_rows > 0:
             progress_bar.progress(min((post_index - 1) / total_rows, 1.0))
@@ -1668,6 +1741,8 @@ def main():
                                 if success:
                                     df.loc[df['Post_ID'] == post['Post_ID'], 'Posted'] = True
                                     post['Posted'] = True
+                                    if schedule_store:
+                                        schedule_store.update(post['Post_ID'], Posted=True)
                                     output_buffer = BytesIO()
                                     df.to_excel(output_buffer, index=False)
                                     st.download_button(
@@ -1703,9 +1778,10 @@ def main():
                                         st.error("Edited text cannot be empty.")
 
             with st.expander("View Log"):
-                log_messages = [f"{r.asctime} - {r.levelname} - {r.message}" for r in recorder.records]
-                st.text("\n".join(log_messages) if log_messages else "No logs available.")
-                recorder.records.clear()
+                log_level = st.selectbox("Minimum level", LOG_LEVELS, index=1, key="log_view_level")
+                log_loggers = st.multiselect("Loggers", sorted(recorder.logger_names), key="log_view_loggers")
+                log_text = render_log_view(getattr(logging, log_level), log_loggers)
+                st.text(log_text if log_text else "No logs available.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+
+logger = logging.getLogger()
+
+SERVICE_NAME = "linkedin-poster"
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_export_file = None
+_export_lock = threading.Lock()
+_current = contextvars.ContextVar("current_span", default=None)
+
+def configure(export_file):
+    """Append finished traces to export_file as OTLP JSON lines; None disables tracing."""
+    global _export_file
+    _export_file = export_file
+
+def trace_id_for(post_id):
+    """Return the trace ID shared by every publish attempt of a Post_ID."""
+    return hashlib.sha256(f"post:{post_id}".encode("utf-8")).hexdigest()[:32]
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Span:
+    """One timed step. Child spans are collected on the root and exported with it."""
+
+    def __init__(self, name, trace_id, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.finished = []
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message=""):
+        self.status = STATUS_ERROR
+        self.message = message
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status}
+        }
+        if self.parent:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message=""):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _export(spans):
+    line = json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME), _attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "post_to_linkedin"}, "spans": [span.to_otlp() for span in spans]}]
+        }]
+    }, separators=(",", ":")) + "\n"
+    try:
+        with _export_lock:
+            with open(_export_file, "a", encoding="utf-8") as f:
+                f.write(line)
+    except Exception as e:
+        logger.error(f"Error exporting trace to {_export_file}: {e}")
+
+class SpanContext:
+    """Context manager timing one step under the current span.
+
+    With post_id, or when no span is active, a new root span is started;
+    its trace ID comes from the Post_ID so every attempt for a post shares
+    one trace. A root span is exported together with its children when it
+    ends. An exception marks the span as failed.
+    """
+
+    def __init__(self, name, post_id=None, **attributes):
+        self.name = name
+        self.post_id = post_id
+        self.attributes = attributes
+
+    def __enter__(self):
+        if _export_file is None:
+            self.span = None
+            return NOOP_SPAN
+        parent = None if self.post_id is not None else _current.get()
+        if parent is not None:
+            trace_id = parent.trace_id
+        elif self.post_id is not None:
+            trace_id = trace_id_for(self.post_id)
+            self.attributes["post_id"] = self.post_id
+        else:
+            trace_id = os.urandom(16).hex()
+        self.span = Span(self.name, trace_id, parent, self.attributes)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        self.span.end_ns = time.time_ns()
+        if exc is not None:
+            self.span.set_error(f"{exc_type.__name__}: {exc}")
+        _current.reset(self.token)
+        self.span.root.finished.append(self.span)
+        if self.span.root is self.span:
+            _export(self.span.finished)
+        return False
+
+def span(name, post_id=None, **attributes):
+    """Return a SpanContext; use as: with span("upload") as current: ..."""
+    return SpanContext(name, post_id, **attributes)
+
+def traced(name, ok=bool, root=False):
+    """Decorator running a function, sync or async, inside span(name).
+
+    The span is marked failed when ok(result) is false. With root=True
+    the first argument is the Post_ID that starts a new trace.
+    """
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, post_id=args[0] if root else None) as current:
+                    result = await func(*args, **kwargs)
+                    if not ok(result):
+                        current.set_error()
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, post_id=args[0] if root else None) as current:
+                result = func(*args, **kwargs)
+                if not ok(result):
+                    current.set_error()
+                return result
+        return wrapper
+    return decorate
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+def summarize(export_file):
+    """Return {span name: (count, errors, p50, p95, p99, max)} with durations in milliseconds."""
+    durations = {}
+    errors = {}
+    with open(export_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            for resource_spans in request.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for item in scope_spans.get("spans", []):
+                        name = item["name"]
+                        duration = (int(item["endTimeUnixNano"]) - int(item["startTimeUnixNano"])) / 1e6
+                        durations.setdefault(name, []).append(duration)
+                        if item.get("status", {}).get("code") == STATUS_ERROR:
+                            errors[name] = errors.get(name, 0) + 1
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = (len(values), errors.get(name, 0), percentile(values, 0.5), percentile(values, 0.95),
+                         percentile(values, 0.99), values[-1])
+    return summary
+
+if __name__ == "__main__":
+    # Per-step latency: python tracing.py [traces.jsonl]
+    export_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "traces.jsonl")
+    summary = summarize(export_file)
+    print(f"{'step':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, (count, error_count, p50, p95, p99, longest) in sorted(summary.items(), key=lambda item: -item[1][3]):
+        print(f"{name:<20}{count:>8}{error_count:>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{longest:>10.1f}")
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import portalocker
+
+logger = logging.getLogger()
+
+class WorkbookSink:
+    """Status updates for output.xlsx, recorded cheaply and merged in batches.
+
+    record() appends one JSON line to output.xlsx.pending under a shared
+    lock, so posters never open the workbook. flush() moves the pending
+    lines aside under an exclusive lock. It then applies all of them with
+    one read and one atomic rewrite of the workbook while holding
+    output.xlsx.writer.lock, so only one process writes the workbook at a
+    time. start() runs a debounced flusher: it flushes once no update has
+    arrived for debounce seconds, or max_delay after it first saw one.
+    """
+
+    def __init__(self, workbook_file, debounce=5, max_delay=60):
+        self.workbook_file = workbook_file
+        self.pending_file = workbook_file + ".pending"
+        self.merging_file = workbook_file + ".merging"
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._lock_handle = open(workbook_file + ".lock", "a")
+        self._writer_handle = open(workbook_file + ".writer.lock", "a")
+        self._lock = threading.Lock()
+
+    def record(self, post_id, **fields):
+        """Queue new column values for a post, e.g. record(post_id, Posted=True)."""
+        line = json.dumps({"Post_ID": post_id, "set": fields, "ts": time.time()}, separators=(",", ":")) + "\n"
+        with self._lock:
+            portalocker.lock(self._lock_handle, portalocker.LOCK_SH)
+            try:
+                with open(self.pending_file, "a") as f:
+                    f.write(line)
+            finally:
+                portalocker.unlock(self._lock_handle)
+
+    def _take_pending(self):
+        """Move pending updates into the merging file; returns False if there are none to merge."""
+        portalocker.lock(self._lock_handle, portalocker.LOCK_EX)
+        try:
+            if os.path.exists(self.pending_file):
+                if os.path.exists(self.merging_file):
+                    # A previous merge failed; keep its updates ahead of the new ones
+                    with open(self.pending_file, "r") as src, open(self.merging_file, "a") as dst:
+                        dst.write(src.read())
+                    os.remove(self.pending_file)
+                else:
+                    os.replace(self.pending_file, self.merging_file)
+        finally:
+            portalocker.unlock(self._lock_handle)
+        return os.path.exists(self.merging_file)
+
+    def _read_merging(self):
+        """Return {Post_ID: fields} from the merging file, later updates winning."""
+        updates = {}
+        with open(self.merging_file, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line in {self.merging_file}")
+                    continue
+                updates.setdefault(record["Post_ID"], {}).update(record["set"])
+        return updates
+
+    def flush(self, wait=False):
+        """Merge every pending update into the workbook; returns how many posts were updated.
+
+        Returns 0 without waiting if another process is writing the
+        workbook, unless wait is True.
+        """
+        with self._lock:
+            flags = portalocker.LOCK_EX if wait else portalocker.LOCK_EX | portalocker.LOCK_NB
+            try:
+                portalocker.lock(self._writer_handle, flags)
+            except portalocker.exceptions.LockException:
+                return 0
+            try:
+                if not self._take_pending():
+                    return 0
+                updates = self._read_merging()
+                if not os.path.exists(self.workbook_file):
+                    logger.error(f"output.xlsx not found at {self.workbook_file}, dropping {len(updates)} status updates")
+                    os.remove(self.merging_file)
+                    return 0
+                # pandas takes longer to import than everything else together
+                import pandas as pd
+                df = pd.read_excel(self.workbook_file)
+                for post_id, fields in updates.items():
+                    for column, value in fields.items():
+                        df.loc[df["Post_ID"] == post_id, column] = value
+                tmp_file = f"{self.workbook_file}.{os.getpid()}.tmp.xlsx"
+                df.to_excel(tmp_file, index=False)
+                os.replace(tmp_file, self.workbook_file)
+                os.remove(self.merging_file)
+                logger.info(f"Merged status updates for {len(updates)} posts into {self.workbook_file}")
+                return len(updates)
+            finally:
+                portalocker.unlock(self._writer_handle)
+
+    def _flush_loop(self):
+        first_seen = None
+        while True:
+            time.sleep(max(self.debounce / 2, 0.1))
+            try:
+                modified = os.stat(self.pending_file).st_mtime
+            except FileNotFoundError:
+                if not os.path.exists(self.merging_file):
+                    first_seen = None
+                    continue
+                modified = 0
+            now = time.time()
+            first_seen = first_seen or now
+            if now - modified < self.debounce and now - first_seen < self.max_delay:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error merging status updates into {self.workbook_file}: {e}")
+            first_seen = None
+
+    def start(self):
+        """Flush in a background thread, debounced, for long-running processes."""
+        threading.Thread(target=self._flush_loop, name="workbook-flush", daemon=True).start()
+
+if __name__ == "__main__":
+    # Merge pending updates on demand: python workbook_sink.py [output.xlsx]
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    workbook = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "output.xlsx")
+    print(f"Updated {WorkbookSink(workbook).flush(wait=True)} posts in {workbook}")